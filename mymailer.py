@@ -59,22 +59,24 @@ parser.add_argument('--path', action="store",dest='path',default='/home/dave/pyt
 parser.add_argument('--GXP_trigger', action="store",dest='GXP_trigger',default = 1000)
 parser.add_argument('--Island_trigger', action="store",dest='Island_trigger',default = 500)
 parser.add_argument('--phonebook', action="store",dest='phonebook',default = 'phonebook.csv')
-cmd_line = parser.parse_args()
+if __name__ == '__main__': #only parse the command line (and log to file below) when run from cron, so MyMailer can be imported (i.e., by wits_replay.py)
+    cmd_line = parser.parse_args()
 
 #############################################################################################################################################################################        
 #Setup logging
 #############################################################################################################################################################################        
 
-formatter = logging.Formatter('|%(asctime)-6s|%(levelname)s|%(message)s|','%Y-%m-%d %H:%M')
-consoleLogger = logging.StreamHandler()
-consoleLogger.setLevel(logging.INFO)
-consoleLogger.setFormatter(formatter)
-logging.getLogger('').addHandler(consoleLogger)
+if __name__ == '__main__':
+    formatter = logging.Formatter('|%(asctime)-6s|%(levelname)s|%(message)s|','%Y-%m-%d %H:%M')
+    consoleLogger = logging.StreamHandler()
+    consoleLogger.setLevel(logging.INFO)
+    consoleLogger.setFormatter(formatter)
+    logging.getLogger('').addHandler(consoleLogger)
 
-fileLogger = logging.handlers.RotatingFileHandler(filename='wits_mail.log',maxBytes = 1024*1024, backupCount = 9)
-fileLogger.setLevel(logging.ERROR)
-fileLogger.setFormatter(formatter)
-logging.getLogger('').addHandler(fileLogger)
+    fileLogger = logging.handlers.RotatingFileHandler(filename='wits_mail.log',maxBytes = 1024*1024, backupCount = 9)
+    fileLogger.setLevel(logging.ERROR)
+    fileLogger.setFormatter(formatter)
+    logging.getLogger('').addHandler(fileLogger)
 
 logger = logging.getLogger('WITS MAIL')
 logger.setLevel(logging.INFO)
@@ -86,6 +88,11 @@ logger.setLevel(logging.INFO)
 class ConnectionError(Exception): pass
 class SendError(Exception): pass
 class OpenHDFFileError(Exception): pass
+
+def triggered(gxp_max,ni,si,GXP_trigger,Island_trigger):
+    """Alert conditions, as (GXP, Island) booleans.  Works on single prices or, for wits_replay.py, whole arrays of them"""
+    return (gxp_max >= GXP_trigger), ((ni >= Island_trigger) | (si >= Island_trigger))
+
 class MyMailer():
     """This class is used to test spot market prices and react to high prices by sending an email to a text alert system"""    
     def __init__(self,host,sender,path,GXP_trigger,Island_trigger,phonebook):
@@ -184,10 +191,10 @@ if __name__ == '__main__':
     send_mail.get_prices()      #get five minute data
     send_mail.report_prices()   #process the data
 
-    if (send_mail.l5w.max() >= send_mail.GXP_trigger) or (send_mail.i5w.T.NI.values[0] >= send_mail.Island_trigger) or (send_mail.i5w.T.SI.values[0] >= send_mail.Island_trigger):
-        if (send_mail.l5w.max() >= send_mail.GXP_trigger):
-			logger.info('GXP price greater than $' + str(send_mail.GXP_trigger) + ', sending text')
-        if (send_mail.i5w.T.NI.values[0] >= send_mail.Island_trigger) or (send_mail.i5w.T.SI.values[0] >= send_mail.Island_trigger):
-			logger.info('Island price greater than $' + str(send_mail.Island_trigger) + ', sending text')
+    gxp_alert, island_alert = triggered(send_mail.l5w.max().values[0],send_mail.i5w.T.NI.values[0],send_mail.i5w.T.SI.values[0],send_mail.GXP_trigger,send_mail.Island_trigger)
+    if gxp_alert or island_alert:
+        if gxp_alert:
+            logger.info('GXP price greater than $' + str(send_mail.GXP_trigger) + ', sending text')
+        if island_alert:
+            logger.info('Island price greater than $' + str(send_mail.Island_trigger) + ', sending text')
         send_mail.send_alert_text()
- 
@@ -0,0 +1,51 @@
+'''
+test_wits_columnar - binary columnar week files (see wits_columnar.py)
+
+python -m unittest test_wits_columnar
+
+'''
+import shutil
+import tempfile
+import unittest
+import datetime as dt
+import numpy as np
+from pandas import *
+from wits_columnar import write_columnar, read_columnar, read_columnar_frame, write_columns, ColumnarFileError
+
+START = dt.datetime(2013,8,1)
+
+class test_wits_columnar(unittest.TestCase):
+
+    def setUp(self):
+        self.wits_path = tempfile.mkdtemp() + '/'
+        dtos = [START + dt.timedelta(minutes=5*k) for k in range(7)]
+        columns = MultiIndex.from_tuples([(d,k//6 + 1) for k,d in enumerate(dtos)],names=['dto','TP'])
+        self.week = DataFrame(np.arange(21.0).reshape(3,7)*10.25,index=['HAY2201','OTA2201','BEN2201'],columns=columns)
+        self.week.iloc[1,3] = np.nan
+
+    def tearDown(self):
+        shutil.rmtree(self.wits_path)
+
+    def test_round_trip(self):     #names, dto, TP and prices (NaN included) back as written
+        write_columnar(self.wits_path + 'all_week.bin',self.week)
+        frame = read_columnar_frame(self.wits_path + 'all_week.bin')
+        self.assertEqual(list(frame.index),list(self.week.index))
+        self.assertEqual(list(frame.columns),list(self.week.columns))
+        np.testing.assert_array_equal(frame.values,self.week.values)   #float32, but these prices are exact
+        self.assertTrue(np.isnan(frame.loc['OTA2201'].iloc[3]))
+
+    def test_layout(self):     #every column on an 8 byte boundary, viewed in place with its own type
+        write_columns(self.wits_path + 'x.bin',['a'],[('dto',np.arange(3,dtype='<u4')),('TP',np.arange(3,dtype='|u1')),('count',np.arange(3,dtype='<u2'))],units='count')
+        names, columns = read_columnar(self.wits_path + 'x.bin')
+        self.assertEqual(names,['a'])
+        for name,dtype in [('dto','<u4'),('TP','|u1'),('count','<u2')]:
+            self.assertEqual(columns[name].dtype,np.dtype(dtype))
+            self.assertEqual(list(columns[name]),[0,1,2])
+            self.assertEqual(columns[name].__array_interface__['data'][0] % 8,0)
+
+    def test_not_columnar(self):
+        open(self.wits_path + 'x.bin','wb').write('WITSJNL1' + '\0'*16)
+        self.assertRaises(ColumnarFileError,read_columnar,self.wits_path + 'x.bin')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,157 @@
+'''
+test_wits_journal - replay of the week journal after a crash (see wits_journal.py)
+
+python -m unittest test_wits_journal
+
+'''
+import os
+import shutil
+import tempfile
+import unittest
+import datetime as dt
+import numpy as np
+from pandas import *
+import wits_journal as journal_module
+from wits_journal import wits_journal, MAGIC, RECORD
+
+NAMES = ['HAY2201','OTA2201','BEN2201']
+START = dt.datetime(2013,8,1)
+
+def record(k):     #interval k of a made up week, prices k, k+1, k+2
+    return {'dto':Timestamp(START + dt.timedelta(minutes=5*k)),'TP':k//6 + 1,
+            'l5':Series(np.arange(3.0) + k,index=NAMES),'i5':Series([k,k],index=['NI','SI'],dtype=float),
+            'r5':Series([k],index=['WTN'],dtype=float),'s5':Series([k,'x'],index=['f1','f2'],dtype=object),
+            'stats':Series([k],index=['Mean'],dtype=object)}
+
+class test_wits_journal(unittest.TestCase):
+
+    def setUp(self):
+        self.wits_path = tempfile.mkdtemp() + '/'
+
+    def tearDown(self):
+        shutil.rmtree(self.wits_path)
+
+    def write(self,records,snapshot_every=1000):
+        journal = wits_journal(self.wits_path,snapshot_every)
+        journal.load()
+        for k in records:
+            journal.append(record(k))
+        return journal
+
+    def replay(self):
+        journal = wits_journal(self.wits_path)
+        journal.load()
+        return journal
+
+    def offsets(self,segment):     #byte offset of each record of a segment
+        data = open(self.wits_path + 'journal_%06i.bin' % segment,'rb').read()
+        offsets, offset = [], len(MAGIC)
+        while offset < len(data):
+            offsets.append(offset)
+            offset = offset + RECORD.size + RECORD.unpack_from(data,offset)[0]
+        return offsets
+
+    def assertWeek(self,journal,records):
+        self.assertEqual(list(journal.frames['l5w'].columns.get_level_values(0)),[record(k)['dto'] for k in records])
+        self.assertEqual(list(journal.frames['l5w'].loc['OTA2201']),[k + 1.0 for k in records])
+
+    def test_torn_tail(self):     #a header cut short is cut off and the next append follows the last good record
+        self.write(range(10))
+        filename = self.wits_path + 'journal_000000.bin'
+        size = os.path.getsize(filename)
+        f = open(filename,'ab')
+        f.write(RECORD.pack(100,0)[:5])
+        f.close()
+        journal = self.replay()
+        self.assertWeek(journal,range(10))
+        self.assertEqual(os.path.getsize(filename),size)
+        journal.append(record(10))
+        self.assertWeek(self.replay(),range(11))
+        self.assertEqual(len(self.offsets(0)),11)
+
+    def test_mid_segment_damage(self):     #a flipped bit in a record length keeps the rest of the segment on disk, and appends go on in a new segment
+        self.write(range(10))
+        filename = self.wits_path + 'journal_000000.bin'
+        data = open(filename,'rb').read()
+        size = len(data)
+        offset = self.offsets(0)[3]
+        data = data[:offset + 1] + chr(ord(data[offset + 1]) ^ 0x40) + data[offset + 2:]
+        open(filename,'wb').write(data)
+        journal = self.replay()
+        self.assertWeek(journal,range(3))
+        self.assertFalse(os.path.isfile(filename))
+        self.assertEqual(os.path.getsize(filename + '.damaged'),size)
+        journal.append(record(10))
+        self.assertWeek(self.replay(),range(3) + [10])
+
+    def test_snapshot_and_later_records(self):     #the snapshot plus the records after it, with the old segments gone
+        journal = self.write(range(25),snapshot_every=10)
+        self.assertEqual(journal.segment,2)
+        self.assertEqual(sorted(os.listdir(self.wits_path)),['journal_000002.bin','journal_snapshot.pickle'])
+        replayed = self.replay()
+        self.assertEqual(replayed.records,5)
+        self.assertWeek(replayed,range(25))
+        for frame_name in journal.frames:
+            self.assertTrue(replayed.frames[frame_name].equals(journal.frames[frame_name]),frame_name)
+
+    def test_directory_synced(self):     #the directory is synced once a segment is started, and after the snapshot rename, before old segments go
+        synced = []
+        sync_dir = journal_module.sync_dir
+        journal_module.sync_dir = lambda path: synced.append((os.path.normpath(path),sorted(os.listdir(path))))
+        try:
+            self.write(range(12),snapshot_every=10)
+        finally:
+            journal_module.sync_dir = sync_dir
+        path = os.path.normpath(self.wits_path)
+        self.assertEqual(synced,[(path,['journal_000000.bin']),
+                                 (path,['journal_000000.bin','journal_snapshot.pickle']),   #snapshot renamed in, segment 0 still there
+                                 (path,['journal_000001.bin','journal_snapshot.pickle'])])
+
+    def test_damaged_snapshot(self):     #a snapshot that cannot be read is set aside and the week replayed from the segments left
+        self.write(range(25),snapshot_every=10)
+        data = open(self.wits_path + 'journal_snapshot.pickle','rb').read()
+        open(self.wits_path + 'journal_snapshot.pickle','wb').write(data[:len(data)//2])
+        journal = self.replay()
+        self.assertWeek(journal,range(20,25))
+        self.assertTrue(os.path.isfile(self.wits_path + 'journal_snapshot.pickle.damaged'))
+        self.assertTrue(journal.checkpoint)   #a good snapshot in its place
+        journal.append(record(25))
+        self.assertWeek(self.replay(),range(20,26))
+
+    def test_damaged_snapshot_and_pickles(self):     #the week pickles of an earlier version, if still there, fill in before the segments left
+        first = self.write(range(20))
+        for frame_name in first.frames:
+            first.frames[frame_name].to_pickle(self.wits_path + frame_name + '.pickle')
+        first.snapshot()
+        for k in range(20,25):
+            first.append(record(k))
+        open(self.wits_path + 'journal_snapshot.pickle','wb').write('not a pickle')
+        self.assertWeek(self.replay(),range(25))
+        self.assertWeek(self.replay(),range(25))
+
+    def test_summary_after_start(self):     #no summary file for the first intervals, the summary fields still join the week when one turns up
+        journal = wits_journal(self.wits_path)
+        journal.load()
+        for k in range(4):
+            r = record(k)
+            if k < 2:
+                del r['s5']
+            journal.append(r)
+        for replayed in [journal,self.replay()]:
+            s5w = replayed.frames['s5w']
+            self.assertEqual(list(s5w.index),['f1','f2'])
+            self.assertEqual(len(s5w.columns),4)
+            self.assertTrue(s5w.iloc[:,:2].isnull().all().all())
+            self.assertEqual(list(s5w.loc['f1'].iloc[2:]),[2,3])
+
+    def test_new_names(self):     #a GXP turning up after the week started gets a row, with no price before it
+        journal = self.write(range(2))
+        r = record(2)
+        r['l5'] = r['l5'].append(Series([9.0],index=['NEW2201']))
+        journal.append(r)
+        l5w = self.replay().frames['l5w']
+        self.assertEqual(list(l5w.index),NAMES + ['NEW2201'])
+        self.assertEqual(list(l5w.loc['NEW2201'].fillna(-1)),[-1,-1,9.0])
+
+if __name__ == '__main__':
+    unittest.main()
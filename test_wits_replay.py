@@ -0,0 +1,83 @@
+'''
+test_wits_replay - replay of stored price files and the trigger sweep (see wits_replay.py)
+
+python -m unittest test_wits_replay
+
+'''
+import os
+import gzip
+import shutil
+import tempfile
+import unittest
+import datetime as dt
+from pandas import *
+from wits_replay import wits_replay
+
+GXPS = [('HAY2201','NI','WTN'),('OTA2201','NI','AKL'),('BEN2201','SI','CAN')]
+START = dt.datetime(2013,8,1)
+
+class test_wits_replay(unittest.TestCase):
+
+    def setUp(self):
+        self.wits_path = tempfile.mkdtemp() + '/'
+        self.history_path = self.wits_path + 'history/'
+        os.makedirs(self.history_path)
+        for k in range(12):   #an hour of made up prices, 10 $/MWh except at 00:00 and 00:30
+            prices = {0:[50,60,350],6:[150,50,40]}.get(k,[10,10,10])
+            self.write(k,'30',prices)
+        self.write(6,'31',[900,50,40])   #00:30 republished, the first copy is the one the cron journaled
+
+    def tearDown(self):
+        shutil.rmtree(self.wits_path)
+
+    def write(self,k,suffix,prices):     #one stored 5 minute price file
+        dto = START + dt.timedelta(minutes=5*k)
+        f = gzip.open(self.history_path + '5minprices_%s%s.csv.gz' % (dto.strftime('%Y%m%d%H%M'),suffix),'wb')
+        for (gxp,island,region),price in zip(GXPS,prices):
+            f.write('%s,%s,%i,%s,%.2f,%s,%s,F,%s\n' % (gxp,dto.strftime('%d/%m/%Y'),k//6 + 1,dto.strftime('%H:%M'),price,island,region,dto.strftime('%d/%m/%Y %H:%M')))
+        f.close()
+
+    def replay(self,alert_minutes=[0,30]):
+        replay = wits_replay(self.history_path,self.wits_path,alert_minutes,2)
+        replay.load_history()
+        replay.prepare()
+        replay.sweep([100.0,300.0],[200.0])
+        return replay
+
+    def test_sweep(self):     #00:00: GXP max 350, SI 350; 00:30: GXP max 150 (not the republished 900), NI 100
+        replay = self.replay()
+        self.assertEqual(len(replay.l5w.columns),12)
+        self.assertEqual(replay.l5w.loc['HAY2201',(START + dt.timedelta(minutes=30),2)],150.0)
+        summary = replay.summary.set_index('GXP_trigger')
+        self.assertEqual(list(summary.loc[100.0,['alerts','GXP_alerts','Island_alerts']]),[2,2,1])
+        self.assertEqual(list(summary.loc[300.0,['alerts','GXP_alerts','Island_alerts']]),[1,1,1])
+        self.assertEqual(summary.loc[100.0,'last_alert'],START + dt.timedelta(minutes=30))
+        alerts = replay.alerts[replay.alerts.GXP_trigger == 100.0]
+        self.assertEqual(list(alerts['Max GXP']),['BEN2201','HAY2201'])
+        self.assertEqual(list(alerts.Island),[True,False])
+
+    def test_cached_interval_kept(self):     #a copy turning up after the interval is cached is ignored, as the cron does
+        self.replay()
+        self.write(0,'32',[10,10,10])
+        replay = self.replay(alert_minutes=None)
+        self.assertEqual(len(replay.files),14)
+        self.assertEqual(replay.l5w.loc['BEN2201',(START,1)],350.0)
+        self.assertEqual(list(replay.summary.alerts),[2,1])
+
+    def test_bad_files(self):     #a file that cannot be read or parsed is skipped, not cached, and picked up once it is fixed
+        bad = self.history_path + '5minprices_%s30.csv.gz' % (START + dt.timedelta(hours=1)).strftime('%Y%m%d%H%M')
+        open(bad,'wb').write('not gzipped')
+        f = gzip.open(self.history_path + '5minprices_%s30.csv.gz' % (START + dt.timedelta(minutes=65)).strftime('%Y%m%d%H%M'),'wb')
+        f.write('HAY2201,garbled\n')
+        f.close()
+        replay = self.replay()
+        self.assertEqual(len(replay.files),13)
+        self.assertEqual(len(replay.l5w.columns),12)
+        self.assertEqual(list(replay.summary.alerts),[2,1])
+        self.write(12,'30',[10,10,10])   #the unreadable file downloaded again
+        replay = self.replay()
+        self.assertEqual(len(replay.files),14)
+        self.assertEqual(len(replay.l5w.columns),13)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+'''
+test_wits_spatial - the interpolated price surface (see wits_spatial.py)
+
+python -m unittest test_wits_spatial
+
+'''
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from pandas import *
+from wits_spatial import wits_spatial, MAX_KM
+
+GXPS = DataFrame({'lat':[-41.28,-36.95,-44.55],'long':[174.78,174.82,170.20]},index=['HAY2201','OTA2201','BEN2201'],columns=['lat','long'])
+
+def nearest_km(spatial):     #distance from each grid cell to its nearest GXP, km (haversine, worked out here without the weights)
+    lat, lng = np.meshgrid(np.radians(spatial.lat),np.radians(spatial.long),indexing='ij')
+    km = []
+    for glat,glng in zip(np.radians(GXPS.lat.values),np.radians(GXPS.long.values)):
+        a = np.sin((glat - lat)/2.0)**2 + np.cos(lat)*np.cos(glat)*np.sin((glng - lng)/2.0)**2
+        km.append(2*6371.0*np.arcsin(np.sqrt(a)).ravel())
+    return np.min(km,axis=0)
+
+class test_wits_spatial(unittest.TestCase):
+
+    def setUp(self):
+        self.wits_path = tempfile.mkdtemp() + '/'
+        GXPS.to_csv(self.wits_path + 'gxps_filtered.csv',index_label='id')
+
+    def tearDown(self):
+        shutil.rmtree(self.wits_path)
+
+    def test_weights(self):     #each cell's weights sum to 1, cells further than MAX_KM from every GXP have none and are NaN
+        spatial = wits_spatial(self.wits_path)
+        spatial.build_weights(GXPS)
+        blank = nearest_km(spatial) > MAX_KM
+        self.assertTrue(blank.any() and not blank.all())
+        np.testing.assert_allclose(spatial.w[~blank].sum(axis=1),1.0,rtol=1e-5)
+        self.assertTrue((spatial.w[blank] == 0).all())
+        surface = spatial.surface(Series([100.0,200.0,300.0],index=GXPS.index)).ravel()
+        self.assertTrue(np.isnan(surface[blank]).all())
+        self.assertFalse(np.isnan(surface[~blank]).any())
+        self.assertTrue(((surface[~blank] >= 100.0) & (surface[~blank] <= 300.0)).all())
+
+    def test_renormalised(self):     #GXPs without a price are left out of the weights, so one priced GXP gives a constant surface
+        spatial = wits_spatial(self.wits_path)
+        spatial.build_weights(GXPS)
+        blank = nearest_km(spatial) > MAX_KM
+        frame = DataFrame({'one':[np.nan,123.0,np.nan],'all':[50.0,50.0,50.0]},index=GXPS.index,columns=['one','all'])
+        surfaces = spatial.surfaces(frame)
+        np.testing.assert_allclose(surfaces[~blank,0],123.0,rtol=1e-6)
+        np.testing.assert_allclose(surfaces[~blank,1],50.0,rtol=1e-6)
+        self.assertTrue(np.isnan(surfaces[blank]).all())
+
+    def test_load_weights(self):     #spatial_weights.pickle reused while gxps_filtered.csv is unchanged, worked out again when it changes
+        spatial = wits_spatial(self.wits_path)
+        spatial.load_weights()
+        self.assertTrue(spatial.changed)
+        self.assertTrue(os.path.isfile(self.wits_path + 'spatial_weights.pickle'))
+        again = wits_spatial(self.wits_path)
+        again.load_weights()
+        self.assertFalse(again.changed)
+        self.assertEqual(again.names,spatial.names)
+        np.testing.assert_array_equal(again.w,spatial.w)
+        moved = GXPS.copy()
+        moved.loc['BEN2201','lat'] = -45.87   #BEN2201 moved south
+        moved.to_csv(self.wits_path + 'gxps_filtered.csv',index_label='id')
+        rebuilt = wits_spatial(self.wits_path)
+        rebuilt.load_weights()
+        self.assertTrue(rebuilt.changed)
+        self.assertFalse(np.array_equal(rebuilt.w,spatial.w))
+        last = wits_spatial(self.wits_path)
+        last.load_weights()
+        self.assertFalse(last.changed)
+        np.testing.assert_array_equal(last.w,rebuilt.w)
+
+if __name__ == '__main__':
+    unittest.main()
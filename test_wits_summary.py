@@ -0,0 +1,79 @@
+'''
+test_wits_summary - the typed reserve/constraint store (see wits_summary.py)
+
+python -m unittest test_wits_summary
+
+'''
+import shutil
+import tempfile
+import unittest
+import datetime as dt
+import numpy as np
+from pandas import *
+from wits_summary import wits_summary, FIELDS
+from wits_columnar import read_columnar, dto_seconds
+
+START = dt.datetime(2013,8,1)
+
+def week(ks):     #made up s5w week frame, every field 0 but SI sustained reserve in deficit (k MW) at k = 3 to 5, and 9 days on
+    columns = MultiIndex.from_tuples([(START + dt.timedelta(minutes=5*k),k//6 + 1) for k in ks],names=['dto','TP'])
+    frame = DataFrame(np.zeros((len(FIELDS),len(ks))),index=sorted(FIELDS),columns=columns).astype(object)
+    for i,k in enumerate(ks):
+        if 3 <= k <= 5 or k > 2592:
+            frame.iloc[list(frame.index).index('SI Sustained Reserve Deficit'),i] = float(k)
+    return frame
+
+class test_wits_summary(unittest.TestCase):
+
+    def setUp(self):
+        self.wits_path = tempfile.mkdtemp() + '/'
+
+    def tearDown(self):
+        shutil.rmtree(self.wits_path)
+
+    def test_missing_values(self):     #a missing price or MW stays NaN, a missing count is 0 and a missing deficit no event
+        frame = week(range(6))
+        frame.loc['SI Sustained Reserve Price',frame.columns[1]] = np.nan
+        frame.loc['Branch Cons',frame.columns[1]] = np.nan
+        frame.loc['SI Sustained Reserve Deficit',frame.columns[4]] = np.nan
+        summary = wits_summary(self.wits_path)
+        summary.update(frame)
+        self.assertTrue(np.isnan(summary.data['SI Sustained Reserve Price'].iloc[1]))
+        self.assertEqual(summary.data['Branch Cons'].dtype,np.dtype('<u2'))
+        self.assertEqual(summary.data['Branch Cons'].iloc[1],0)
+        self.assertEqual(list(summary.when('SI Sustained Reserve Deficit')),[Timestamp(START + dt.timedelta(minutes=5*k)) for k in [3,5]])
+
+    def test_episodes(self):     #runs of consecutive intervals in deficit, with the peak of each
+        summary = wits_summary(self.wits_path)
+        summary.update(week(range(12)))
+        summary.update(week(range(12) + [2600,2601]))   #only the new intervals are added
+        episodes = summary.episodes('SI Sustained Reserve Deficit')
+        self.assertEqual(len(summary.data),14)
+        self.assertEqual(list(episodes.intervals),[3,2])
+        self.assertEqual(list(episodes.peak),[5.0,2601.0])
+        self.assertEqual(len(summary.when('SI Sustained Reserve Deficit',start=START + dt.timedelta(days=1))),2)
+
+    def test_week_file(self):     #reserve_week.bin has only the last week, each field in its own type
+        summary = wits_summary(self.wits_path)
+        summary.update(week(range(12) + [2600,2601]))
+        summary.spit_to_bin()
+        names, columns = read_columnar(self.wits_path + 'reserve_week.bin')
+        self.assertEqual(list(columns['dto']),list(dto_seconds([START + dt.timedelta(minutes=5*k) for k in [2600,2601]])))
+        self.assertEqual(columns['SISIR'].dtype,np.dtype('<f4'))
+        self.assertEqual(columns['Branch_Cons'].dtype,np.dtype('<u2'))
+        self.assertEqual(list(columns['SI_Sustained_Reserve_Deficit']),[2600.0,2601.0])
+
+    def test_damaged_pickle(self):     #a summary.pickle cut short starts the store again, to be saved
+        summary = wits_summary(self.wits_path)
+        summary.update(week(range(6)))
+        summary.save()
+        open(summary.summary_file,'wb').write(open(summary.summary_file,'rb').read()[:100])
+        summary = wits_summary(self.wits_path)
+        summary.load()
+        self.assertTrue(summary.rebuilt)
+        self.assertEqual(len(summary.data),0)
+        summary.update(week(range(6)))
+        self.assertEqual(len(summary.when('SI Sustained Reserve Deficit')),3)
+
+if __name__ == '__main__':
+    unittest.main()
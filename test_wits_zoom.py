@@ -0,0 +1,117 @@
+'''
+test_wits_zoom - the downsampled zoom levels (see wits_zoom.py)
+
+python -m unittest test_wits_zoom
+
+'''
+import os
+import json
+import shutil
+import tempfile
+import unittest
+import datetime as dt
+import numpy as np
+from pandas import *
+from wits_zoom import wits_zoom, level, CHUNK
+from wits_columnar import read_columnar, dto_seconds
+from wits_journal import wits_journal
+
+START = dt.datetime(2013,8,1)
+
+def week(ks):     #made up names x (dto,TP) frame, HAY2201 at k $/MWh and BEN2201 at 100 - k (no price at k = 7)
+    columns = MultiIndex.from_tuples([(START + dt.timedelta(minutes=5*k),1) for k in ks],names=['dto','TP'])
+    frame = DataFrame([[float(k) for k in ks],[100.0 - k for k in ks]],index=['HAY2201','BEN2201'],columns=columns)
+    frame.loc['BEN2201',[c for c in columns if c[0] == START + dt.timedelta(minutes=35)]] = np.nan
+    return frame
+
+class test_wits_zoom(unittest.TestCase):
+
+    def setUp(self):
+        self.wits_path = tempfile.mkdtemp() + '/'
+
+    def tearDown(self):
+        shutil.rmtree(self.wits_path)
+
+    def test_fold_across_saves(self):     #buckets carried over a save merge with the intervals after it, as if folded in one go
+        zoom = wits_zoom(self.wits_path)
+        zoom.update({'all':week(range(10))})
+        zoom.save()
+        zoom = wits_zoom(self.wits_path)
+        zoom.load()
+        zoom.update({'all':week(range(24))})   #the whole week again, only intervals 10-23 are new
+        once = wits_zoom(self.wits_path)
+        once.update({'all':week(range(24))})
+        self.assertEqual(zoom.last,START + dt.timedelta(minutes=115))
+        for label in ['5min','30min','2h','6h','1d']:
+            for k in ['min','max','sum','count']:
+                self.assertTrue(zoom.levels[('all',label)][k].equals(once.levels[('all',label)][k]),(label,k))
+        half = zoom.levels[('all','30min')]   #00:30 to 00:55, k = 6 to 11, split over the save, no BEN2201 price at k = 7
+        t = Timestamp(START + dt.timedelta(minutes=30))
+        self.assertEqual([half[k].loc[t,'HAY2201'] for k in ['min','max','sum','count']],[6.0,11.0,51.0,6])
+        self.assertEqual([half[k].loc[t,'BEN2201'] for k in ['min','max','sum','count']],[89.0,94.0,456.0,5])
+        self.assertEqual(zoom.series('all','30min','BEN2201','mean')[t],456.0/5)
+
+    def test_days_kept(self):     #buckets older than the days kept by a level are dropped
+        zoom = wits_zoom(self.wits_path)
+        zoom.update({'all':week([0,1,2])})
+        zoom.update({'all':week([8*288])})   #8 days on
+        self.assertEqual(len(zoom.levels[('all','5min')]['max']),1)
+        self.assertEqual(len(zoom.levels[('all','30min')]['max']),2)
+
+    def test_level(self):     #finest level keeping the window with buckets no wider than a pixel, else finest keeping it, else longest kept
+        self.assertEqual(level(1,5)[0],'5min')
+        self.assertEqual(level(30,30)[0],'30min')
+        self.assertEqual(level(60,60)[0],'2h')
+        self.assertEqual(level(365,365)[0],'6h')
+        self.assertEqual(level(365,100)[0],'6h')
+        self.assertEqual(level(2000,1440)[0],'1d')
+
+    def test_query(self):     #two hours at four pixels: the five minute buckets combined per half hour pixel
+        zoom = wits_zoom(self.wits_path)
+        zoom.update({'all':week(range(24))})
+        series = zoom.query('all','HAY2201',START,START + dt.timedelta(hours=2),4)
+        self.assertEqual(list(series.index),[Timestamp(START + dt.timedelta(minutes=30*i)) for i in range(4)])
+        self.assertEqual(list(series),[5.0,11.0,17.0,23.0])
+        self.assertEqual(list(zoom.query('all','BEN2201',START,START + dt.timedelta(hours=2),4,'min')),[95.0,89.0,83.0,77.0])
+
+    def test_spit_to_bin(self):     #one file per CHUNK buckets, only those changed since the load written, and the index of them
+        zoom = wits_zoom(self.wits_path)
+        zoom.update({'all':week(range(CHUNK))})   #12 hours, the first five minute file
+        zoom.save()
+        zoom.spit_to_bin()
+        chunk = dto_seconds([START])[0] // (300*CHUNK)
+        index = json.load(open(self.wits_path + 'all_zoom.json'))
+        self.assertEqual(index['names'],['HAY2201','BEN2201'])
+        self.assertEqual(index['chunks']['5min'],[chunk,chunk])
+        names, columns = read_columnar(zoom.chunk_file('all','5min',chunk))
+        self.assertEqual(list(columns['max'][0]),range(CHUNK))
+        self.assertTrue(np.isnan(columns['mean'][1][7]))
+        os.remove(zoom.chunk_file('all','5min',chunk))
+        zoom = wits_zoom(self.wits_path)
+        zoom.load()
+        zoom.update({'all':week(range(CHUNK + 24))})   #two hours into the next five minute file, the first is not written again
+        zoom.spit_to_bin()
+        self.assertEqual(json.load(open(self.wits_path + 'all_zoom.json'))['chunks']['5min'],[chunk,chunk + 1])
+        names, columns = read_columnar(zoom.chunk_file('all','5min',chunk + 1))
+        self.assertEqual(list(columns['max'][0]),range(CHUNK,CHUNK + 24))
+        self.assertFalse(os.path.isfile(zoom.chunk_file('all','5min',chunk)))
+
+    def test_damaged_pickle(self):     #a zoom.pickle cut short is rebuilt from the journal, and saved again
+        journal = wits_journal(self.wits_path)
+        journal.load()
+        frame = week(range(3))
+        for dto,TP in frame.columns:
+            journal.append({'dto':dto,'TP':TP,'l5':frame[(dto,TP)]})
+        zoom = wits_zoom(self.wits_path)
+        zoom.update({'all':frame})
+        zoom.save()
+        data = open(zoom.zoom_file,'rb').read()
+        open(zoom.zoom_file,'wb').write(data[:len(data)//2])
+        zoom = wits_zoom(self.wits_path)
+        zoom.load()
+        self.assertTrue(zoom.rebuilt)
+        self.assertEqual(zoom.last,START + dt.timedelta(minutes=10))
+        self.assertEqual(list(zoom.levels[('all','30min')]['max']['BEN2201']),[100.0])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+// wits_columnar.js - load the binary columnar week files (all_week.bin, island_week.bin, region_week.bin) written by
+// wits_ftp_opsys.py as javascript typed arrays.  The layout is described in wits_columnar.py.  Nothing is parsed or
+// copied: each column is a typed array view onto the downloaded buffer.
+//
+//   witsColumnar("all_week.bin", function(error, week) {
+//       week.names          GXP names
+//       week.dto            Uint32Array, seconds since 1970 (NZ local time, so read with getUTCHours etc.)
+//       week.TP             Uint8Array, trading periods
+//       week.series("HAY2201")  Float32Array of $/MWh prices for one GXP, NaN where there is no price
+//   });
+//
+// The zoom files written by wits_zoom.py have min, max and mean matrices instead of price, i.e., zoom.series("HAY2201", "max").
+
+function witsColumnar(url, callback) {
+    var xhr = new XMLHttpRequest();
+    xhr.open("GET", url, true);
+    xhr.responseType = "arraybuffer";
+    xhr.onload = function() {
+        if (xhr.status != 200) return callback(new Error(url + ": " + xhr.status));
+        try { var data = witsColumnar.parse(xhr.response); }
+        catch (error) { return callback(error); }
+        callback(null, data);
+    };
+    xhr.onerror = function() { callback(new Error(url + ": request failed")); };
+    xhr.send();
+}
+
+witsColumnar.types = {"|u1": Uint8Array, "<u2": Uint16Array, "<u4": Uint32Array, "<f4": Float32Array, "<f8": Float64Array};
+
+witsColumnar.parse = function(buffer) {
+    if (String.fromCharCode.apply(null, new Uint8Array(buffer, 0, 8)) != "WITSCOL1") throw new Error("not a WITS columnar file");
+    var headerLength = new DataView(buffer).getUint32(8, true),
+        bytes = new Uint8Array(buffer, 12, headerLength),
+        text = "";
+    for (var i = 0; i < headerLength; i += 4096) text += String.fromCharCode.apply(null, bytes.subarray(i, i + 4096));
+    var header = JSON.parse(text),
+        data = {names: header.names, n: header.n, units: header.units, step: header.step, grid: header.grid, index: {}};
+    for (var name in header.columns) {
+        var c = header.columns[name],
+            length = c.shape.reduce(function(a, b) { return a * b; }, 1);
+        data[name] = new witsColumnar.types[c.dtype](buffer, c.offset, length);
+    }
+    header.names.forEach(function(name, i) { data.index[name] = i; });
+    data.series = function(name, column) {
+        var i = data.index[name];
+        return data[column || "price"].subarray(i * data.n, (i + 1) * data.n);
+    };
+    return data;
+};
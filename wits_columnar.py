@@ -0,0 +1,107 @@
+'''
+wits_columnar - binary columnar copies of the week (and replay history) price frames
+
+Copyright (C) 2013, Electricty Authority, New Zealand.
+
+License, see https://github.com/ElectricityAuthority/LICENSE/blob/master/LICENSE.md
+
+The CSV files written by wits_ftp_opsys.py cost every reader formatting, parsing and date guessing of ~500k numbers, and
+are scaled by 1/100.  The .bin files written alongside them hold the same frames, unscaled ($/MWh), as typed columns:
+
+    bytes 0-7     magic 'WITSCOL1'
+    bytes 8-11    header length H (little endian uint32)
+    bytes 12-12+H JSON header, space padded so the data starts on an 8 byte boundary:
+                  {"names": [GXPs (or islands/regions)], "n": intervals, "units": "$/MWh",
+                   "columns": {"dto":   {"dtype": "<u4", "offset": ..., "shape": [n]},          seconds since 1970, NZ local time
+                               "TP":    {"dtype": "|u1", "offset": ..., "shape": [n]},          trading period
+                               "price": {"dtype": "<f4", "offset": ..., "shape": [names, n]}}}  one row per name, NaN = no price
+
+Every column starts on an 8 byte boundary so it can be viewed in place, either with numpy (read_columnar, below) or as
+javascript typed arrays (wits_columnar.js).  Other price matrices (i.e., the min/max/mean of wits_zoom.py) use the same
+layout with their own column names.  Files are written to a .tmp file and renamed over the old one, so readers
+(the webserver, cubism pages) never see half a file.  They are not flushed to disk (fsync): they are all worked out
+from the journal (see wits_journal.py) and a crash is put right by the next run, or wits_ftp_opsys.py --rebuild.
+
+'''
+import os
+import json
+import struct
+import numpy as np
+from pandas import *
+
+#############################################################################################################################################################################
+#Exception class pass...
+#############################################################################################################################################################################
+
+class ColumnarFileError(Exception): pass
+
+MAGIC = 'WITSCOL1'
+
+def _pad(n):    #bytes needed to take n to the next 8 byte boundary
+    return (8 - n % 8) % 8
+
+#############################################################################################################################################################################
+def dto_seconds(dtos):     #seconds since 1970 (NZ local time, as stamped) for a sequence of date/time objects
+#############################################################################################################################################################################
+    return (DatetimeIndex(dtos).asi8 // 10**9).astype('<u4')
+
+#############################################################################################################################################################################
+def write_columns(filename,names,columns,**info):     #write a list of (column name, numpy array), and any extra header info, to filename, atomically
+#############################################################################################################################################################################
+    header = {'names':names,'n':len(columns[0][1]),'units':'$/MWh','columns':{}}
+    header.update(info)
+    header_len = 0
+    while True:   #the offsets depend on the header length, so grow the header until they fit
+        offset = 12 + header_len
+        for name,data in columns:
+            header['columns'][name] = {'dtype':data.dtype.str,'offset':offset,'shape':list(data.shape)}
+            offset = offset + data.nbytes + _pad(data.nbytes)
+        text = json.dumps(header)
+        if len(text) + _pad(12 + len(text)) <= header_len:
+            break
+        header_len = len(text) + _pad(12 + len(text))
+    text = text + ' '*(header_len - len(text))
+    tmp_file = filename + '.tmp'
+    f = open(tmp_file,'wb')
+    try:
+        f.write(MAGIC)
+        f.write(struct.pack('<I',header_len))
+        f.write(text)
+        for name,data in columns:
+            f.write(data.tostring())
+            f.write('\0'*_pad(data.nbytes))
+    finally:
+        f.close()
+    os.rename(tmp_file,filename)  #atomic on POSIX
+
+#############################################################################################################################################################################
+def write_columnar(filename,frame):     #write a names x (dto,TP) frame (i.e., l5w, i5w, r5w) to filename
+#############################################################################################################################################################################
+    names = [str(x) for x in frame.index]
+    dto = dto_seconds(frame.columns.get_level_values(0))
+    TP = np.array(frame.columns.get_level_values(1), dtype='<u1')
+    price = np.ascontiguousarray(frame.values, dtype='<f4')
+    write_columns(filename,names,[('dto',dto),('TP',TP),('price',price)])
+
+#############################################################################################################################################################################
+def read_columnar(filename):     #names and a dict of numpy arrays viewing the file in place (memory mapped, no copying or parsing)
+#############################################################################################################################################################################
+    buf = np.memmap(filename, dtype='u1', mode='r')
+    if buf[:8].tostring() != MAGIC:
+        raise ColumnarFileError('%s is not a WITS columnar file' % filename)
+    header_len = struct.unpack('<I',buf[8:12].tostring())[0]
+    header = json.loads(buf[12:12+header_len].tostring())
+    columns = {}
+    for name,c in header['columns'].items():
+        dtype = np.dtype(str(c['dtype']))
+        nbytes = int(np.prod(c['shape'])) * dtype.itemsize
+        columns[name] = buf[c['offset']:c['offset']+nbytes].view(dtype).reshape(c['shape'])
+    return header['names'], columns
+
+#############################################################################################################################################################################
+def read_columnar_frame(filename):     #the names x (dto,TP) frame back again, as written by write_columnar
+#############################################################################################################################################################################
+    names, columns = read_columnar(filename)
+    dtos = to_datetime(columns['dto'].astype('i8'), unit='s')
+    idx = MultiIndex.from_arrays([dtos,columns['TP'].astype(int)], names=['dto','TP'])
+    return DataFrame(columns['price'], index=names, columns=idx)
@@ -0,0 +1,129 @@
+// wits_cubism.js - cubism sources for the binary columnar files written by wits_ftp_opsys.py (see wits_columnar.py).
+// Needs cubism.v1.js and wits_columnar.js.
+//
+//   witsColumnar("all_week.bin", function(error, week) {
+//     context.columnar(week).metric("HAY2201")    $/MWh prices, one value per step, NaN where there is no price
+//   });
+//
+// Files with one column per name (i.e., reserve_week.bin) work the same way: context.columnar(reserve).metric("NIFIR").
+//
+// The downsampled series written by wits_zoom.py are read as they are needed, by zoom level and file, from the index of
+// a group (all_zoom.json, with the names):
+//
+//   d3.json("all_zoom.json", function(index) {
+//     context.wits(index).metric("HAY2201")         max of each step, or context.wits(index, "mean") for min/mean
+//   });
+
+// seconds since 1970 in NZ local time, as the .bin files are stamped
+function wits_cubismSeconds(date) {
+  return Math.floor(date / 1000) - date.getTimezoneOffset() * 60;
+}
+
+// one value per step between start and stop from a dto stamped series: the last ("last"), largest ("max"), smallest
+// ("min") or mean ("mean") of the values whose width seconds from their dto overlap each step (1 second for points)
+function wits_cubismValues(dto, series, start, stop, step, how, width) {
+  var values = [],
+      lo = 0, hi = dto.length, i;
+  width = width || 1;
+  for (var t = +start; t < +stop; t += step) {
+    var begin = wits_cubismSeconds(new Date(t)),
+        end = wits_cubismSeconds(new Date(t + step)),
+        value = NaN, n = 0;
+    hi = dto.length;
+    while (lo < hi) { i = (lo + hi) >> 1; if (dto[i] + width <= begin) lo = i + 1; else hi = i; }
+    for (var j = lo; j < dto.length && dto[j] < end; j++) {
+      var x = series[j];
+      if (isNaN(x)) continue;
+      if (isNaN(value) || how == "last") value = x, n = 1;
+      else if (how == "max") value = Math.max(value, x);
+      else if (how == "min") value = Math.min(value, x);
+      else value += (x - value) / ++n;
+    }
+    values.push(value);
+  }
+  return values;
+}
+
+// cubism keeps its context prototype to itself, so take it from a context that is stopped before it starts
+var wits_cubismContextPrototype = Object.getPrototypeOf(cubism.context().stop());
+
+wits_cubismContextPrototype.columnar = function(data) {
+  var source = {},
+      context = this;
+
+  source.metric = function(name) {
+    var series = data.price ? data.series(name) : data[name];
+    return context.metric(function(start, stop, step, callback) {
+      callback(null, wits_cubismValues(data.dto, series, start, stop, step, "last"));
+    }, name);
+  };
+
+  return source;
+};
+
+// the zoom levels of wits_zoom.py: label, bucket seconds and days kept (the buckets per file are in the index)
+var wits_cubismZoomLevels = [["5min", 300, 7], ["30min", 1800, 35], ["2h", 7200, 140], ["6h", 21600, 400], ["1d", 86400, 1830]];
+
+// the finest zoom level that keeps the whole span (milliseconds) with buckets no wider than step (as wits_zoom.level),
+// otherwise the finest that keeps it all, otherwise the one kept longest
+function wits_cubismZoomLevel(span, step) {
+  var days = span / 864e5,
+      kept = wits_cubismZoomLevels.filter(function(l) { return l[2] >= days; }),
+      fine = kept.filter(function(l) { return l[1] * 1000 <= step; });
+  if (fine.length) return fine[0];
+  if (kept.length) return kept[0];
+  return wits_cubismZoomLevels[wits_cubismZoomLevels.length - 1];
+}
+
+wits_cubismContextPrototype.wits = function(index, how) {
+  var source = {},
+      context = this,
+      files = {};
+
+  if (!how) how = "max";
+
+  // one file of CHUNK buckets, loaded once; a file that is not there (yet) is no data rather than an error
+  function load(label, chunk, callback) {
+    var url = index.group + "_zoom_" + label + "_" + chunk + ".bin",
+        file = files[url];
+    if (!file) {
+      file = files[url] = {callbacks: []};
+      witsColumnar(url, function(error, data) {
+        file.done = true, file.data = error ? null : data;
+        file.callbacks.forEach(function(callback) { callback(file.data); });
+      });
+    }
+    if (file.done) callback(file.data);
+    else file.callbacks.push(callback);
+  }
+
+  source.metric = function(name) {
+    return context.metric(function(start, stop, step, callback) {
+      var level = wits_cubismZoomLevel(context.size() * step, step),  // the whole chart, not just this request, so a chart keeps to one level
+          span = level[1] * index.chunk,
+          kept = index.chunks[level[0]] || [0, -1],
+          first = Math.max(Math.floor(wits_cubismSeconds(start) / span), kept[0]),
+          last = Math.min(Math.floor((wits_cubismSeconds(stop) - 1) / span), kept[1]),
+          chunks = [],
+          waiting = Math.max(last - first + 1, 0);
+      function done() {
+        var dto = [], series = [];
+        chunks.forEach(function(data) {
+          if (!data || !(name in data.index)) return;
+          var values = data.series(name, how);
+          for (var i = 0; i < data.n; i++) dto.push(data.dto[i]), series.push(values[i]);
+        });
+        callback(null, wits_cubismValues(dto, series, start, stop, step, how, level[1]));
+      }
+      if (!waiting) return done();
+      for (var chunk = first; chunk <= last; chunk++) (function(i) {
+        load(level[0], chunk, function(data) {
+          chunks[i] = data;
+          if (!--waiting) done();
+        });
+      })(chunk - first);
+    }, name);
+  };
+
+  return source;
+};
@@ -23,6 +23,11 @@ import smtplib
 from email.mime.text import MIMEText
 import ftplib
 import setuphttpproxy as sup
+from wits_columnar import write_columnar
+from wits_zoom import wits_zoom
+from wits_spatial import wits_spatial
+from wits_summary import wits_summary, parse_summary, RESERVE_PRICES
+from wits_journal import wits_journal
 import datetime as dt
 import StringIO
 import pickle
@@ -48,27 +53,31 @@ parser.add_argument('--ftp_pass', action="store",dest='ftp_pass')
 parser.add_argument('--wits_path', action="store",dest='wits_path',default='/home/dave/python/wits_ftp/')
 parser.add_argument('--proxy_host', action="store",dest='proxy_host',default='172.29.52.79') #use eaintranet as of ~5/2013. Use 127.0.0.1 when using cntlm on workstation...
 parser.add_argument('--proxy_port', action="store",dest='proxy_port',default='8081') #use earnie as of ~5/2013. Use 3128 when using cntlm on workstation...
-cmd_line = parser.parse_args()
+parser.add_argument('--rebuild', action="store_true",dest='rebuild',default=False) #rebuild the week, csv and bin files from the journal (see wits_journal.py), without the ftp
+if __name__ == '__main__': #only parse the command line (and tunnel/log below) when run from cron, so the class can be imported (i.e., by wits_replay.py)
+    cmd_line = parser.parse_args()
 
 #############################################################################################################################################################################        
 #Setup tunnel
 #############################################################################################################################################################################        
 
-tunnel = sup.setup_http_proxy(cmd_line.proxy_host,cmd_line.proxy_port)
+if __name__ == '__main__':
+    tunnel = sup.setup_http_proxy(cmd_line.proxy_host,cmd_line.proxy_port)
 
 #############################################################################################################################################################################        
 #Setup logging
 #############################################################################################################################################################################        
 
-formatter = logging.Formatter('|%(asctime)-6s|%(message)s|','%Y-%m-%d %H:%M')
-consoleLogger = logging.StreamHandler()
-consoleLogger.setLevel(logging.INFO)
-consoleLogger.setFormatter(formatter)
-logging.getLogger('').addHandler(consoleLogger)
-fileLogger = logging.handlers.RotatingFileHandler(filename=cmd_line.wits_path + 'wits_ftp.log',maxBytes = 1024*1024, backupCount = 9)
-fileLogger.setLevel(logging.ERROR)
-fileLogger.setFormatter(formatter)
-logging.getLogger('').addHandler(fileLogger)
+if __name__ == '__main__':
+    formatter = logging.Formatter('|%(asctime)-6s|%(message)s|','%Y-%m-%d %H:%M')
+    consoleLogger = logging.StreamHandler()
+    consoleLogger.setLevel(logging.INFO)
+    consoleLogger.setFormatter(formatter)
+    logging.getLogger('').addHandler(consoleLogger)
+    fileLogger = logging.handlers.RotatingFileHandler(filename=cmd_line.wits_path + 'wits_ftp.log',maxBytes = 1024*1024, backupCount = 9)
+    fileLogger.setLevel(logging.ERROR)
+    fileLogger.setFormatter(formatter)
+    logging.getLogger('').addHandler(fileLogger)
 logger = logging.getLogger('WITS FTP')
 logger.setLevel(logging.INFO)
 
@@ -85,6 +94,40 @@ class GZIPfileError(Exception): pass
 class WITSFileNameGuessError(Exception): pass
 class FTPRetrBinaryError(Exception): pass
 
+#############################################################################################################################################################################
+#Price processing functions.  Used by wits_ftp for one five minute file and by wits_replay.py for many files at once, so both see exactly the same numbers
+#############################################################################################################################################################################
+
+def wits_dto(date,time):     #date/time object from the WITS date (dd/mm/yyyy) and time (hh:mm) strings
+    return datetime(int(date.split('/')[2]),int(date.split('/')[1]),int(date.split('/')[0]),int(time.split(':')[0]),int(time.split(':')[1]))
+
+def parse_prices(buf,names,lmt):     #read one or more WITS 5 minute price files into a GXP indexed frame with a dto column
+    l5 = read_csv(buf, names = names)
+    stamp = l5.date + ' ' + l5.time   #only a handful of distinct stamps (one per file), so convert those and map back
+    dtos = Series([wits_dto(*s.split(' ')) for s in stamp.unique()], index=stamp.unique())
+    l5['dto'] = stamp.map(dtos)
+    l5 = l5.drop(['date', 'time' , 'price_type' , 'file_write'], axis=1) #we have the datetime, delete all the extra crap that wastes space.
+    l5 = l5[(l5.price<lmt)&(l5.price>-lmt)] #removes any row over or under the lmt
+    republished = DataFrame({'gxp':l5.index,'dto':l5.dto.values}).duplicated(['gxp','dto'],keep='first').values
+    return l5[~republished]   #a GXP/interval in more than one file (republished, or .csv and .csv.gz), keep the first file's price, as the journal does
+
+def aggregate_prices(l5):    #GXP, island and region mean price frames, one column per (dto,TP) interval
+    l5w = l5.set_index(['dto','TP'],append=True).price.unstack(['dto','TP'])
+    i5w = l5.groupby(['island','dto','TP']).price.mean().unstack(['dto','TP'])
+    r5w = l5.groupby(['region','dto','TP']).price.mean().unstack(['dto','TP'])
+    return l5w, i5w, r5w
+
+def interval_stats(l5w):     #statistics over all GXPs, for each interval (column) of a GXP price frame
+    return DataFrame([l5w.idxmax(),l5w.max(),l5w.mean(),l5w.idxmin(),l5w.min(),l5w.std(),l5w.skew(),l5w.kurt()], index=['Max GXP','Max $/MWh','Mean','Min GXP','Min $/MWh','Std','Skew','Kurt'])
+
+def bytp(week):     #group a (dto,TP) indexed week frame by trading period for the text alert system in mymailer.py
+    week['Date']=week.index.map(lambda x: x[0].date())
+    return week.fillna(0).groupby(level=[0,1]).mean()
+
+def write_csv(frame,filename,**kwargs):     #frame.to_csv to a .tmp file renamed over the old one, so readers (mymailer.py, the d3 pages) never see half a file
+    frame.to_csv(filename + '.tmp',**kwargs)
+    os.rename(filename + '.tmp',filename)  #atomic on POSIX
+
 class wits_ftp():
    
     def __init__(self,ftp_host,ftp_user,ftp_pass,wits_path):
@@ -127,6 +170,8 @@ class wits_ftp():
         self.r5w = DataFrame() #live 5 minute region mean price DataFrame for one week 
         self.s5w = DataFrame() #summary 5 minute dataframe
         self.statsw = DataFrame() #live 5 minute region mean price DataFrame for one week 
+        self.journal = None #interval journal the week DataFrames are rebuilt from
+        self.checkpoint = False #save the zoom and summary stores this run (when the journal is snapshot)
         self.mult_idx = None
         self.lmt = 400000  #Max and minimum price filter (in cents)
         self.dto = None #Date time object
@@ -224,11 +269,13 @@ class wits_ftp():
         five_min_data.seek(0, os.SEEK_END)
         if pis == 'p' or pis == 'i':
             if five_min_data.tell() > 0: #if we have some data
-                got_file_end = time.time()     
+                got_file_end = time.time()
                 five_min_data.seek(0) #rewind stream to start!
                 f = gzip.GzipFile(mode='rb', fileobj=five_min_data)
                 try:
                     self.f[pis] = f.read()
+                    if pis == 'p':
+                        self.archive(filename,five_min_data.getvalue())  #keep the raw price file for wits_replay.py, only once it has unzipped
                 except: #otherwise, log error
                     if pis == 'i':
                         error_text = (self.min5min + '|Unable to unzip %s!'.center(89,'*')) % filename
@@ -256,6 +303,20 @@ class wits_ftp():
             five_min_data.seek(0)
             self.f[pis] = five_min_data.read() 
             
+    #############################################################################################################################################################################        
+    def archive(self,filename,data):       #save a downloaded file, as is, to wits_path/history/ (the input of wits_replay.py)
+    #############################################################################################################################################################################        
+        history_path = self.wits_path + 'history/'
+        try:
+            if not os.path.isdir(history_path):
+                os.makedirs(history_path)
+            f = open(history_path + os.path.basename(filename) + '.tmp','wb')
+            f.write(data)
+            f.close()
+            os.rename(history_path + os.path.basename(filename) + '.tmp',history_path + os.path.basename(filename))
+        except (IOError, OSError), e:
+            logger.error('Unable to archive %s: %s' % (filename,e))
+
     #############################################################################################################################################################################        
     def ftp_quit(self):       #Quit FTP server
     #############################################################################################################################################################################        
@@ -279,20 +340,15 @@ class wits_ftp():
         if self.f['p']: #if prices exist
             if isnull(self.f['p']) == False:
                 buf = StringIO.StringIO(self.f['p'])   #ok, this is a string buffer straight from the ftp
-                self.l5 = read_csv(buf, names = self.colnames['p'])   #read in the new live 5 data 
-                #Now obtain the dto from the data        
-                self.dto = datetime(int(self.l5.date[0].split('/')[2]),int(self.l5.date[0].split('/')[1]),int(self.l5.date[0].split('/')[0]),int(self.l5.time[0].split(':')[0]),int(self.l5.time[0].split(':')[1])) #yes, the date/time object of this file, read from the first row.
-                self.TP = self.l5.TP[0]  #get the current trading period
-                self.l5 = self.l5.drop(['date', 'TP' , 'time' , 'price_type' , 'file_write'], axis=1) #we have the datetime, delete all the extra crap that wastes space.
-                self.l5 = self.l5.ix[((self.l5<self.lmt)*(self.l5>-self.lmt)).price,:] #removes any row over or under the self.lmt (Note: could be smarter here are then add those removes to the inf.index obj and record - perhaps somehting for the future
-                self.r5 = self.l5.groupby('region').mean().price #r5 is the regional mean price series
-                self.r5 = self.r5.T             #transpose, and, 
+                self.l5 = parse_prices(buf, self.colnames['p'], self.lmt)   #read in the new live 5 data, stamped with the dto and filtered by self.lmt (Note: could be smarter here are then add those removes to the inf.index obj and record - perhaps somehting for the future
+                self.dto = self.l5.dto.iloc[0] #yes, the date/time object of this file, read from the first row.
+                self.TP = self.l5.TP.iloc[0]  #get the current trading period
+                l5w, i5w, r5w = aggregate_prices(self.l5)  #GXP, island and region frames with a single (dto,TP) column
+                self.r5 = r5w[r5w.columns[0]]   #r5 is the regional mean price series
                 self.r5.name = self.dto         #rename region series with the datetimeobject (dto)
-                self.i5 = self.l5.groupby('island').mean().price #i5 is the island mean price series
-                self.i5 = self.i5.T             #transpose, and, 
+                self.i5 = i5w[i5w.columns[0]]   #i5 is the island mean price series
                 self.i5.name = self.dto         #rename island series with the datetimeobject (dto)
-                self.l5 = self.l5.pop('price')  #remove the extra island and region columns and pop only the price to a series, as this is all we require.
-                self.l5 = self.l5.T             #transpose, and, 
+                self.l5 = l5w[l5w.columns[0]]   #only the price series, as this is all we require.
                 self.l5.name = self.dto         #rename
                 #Now we need to store the live5 data in a dataframe, based on the above dto name tags.
                 #Too complicate things, we need a multi-index with trading periods on the column indexing (and possible hours in the future).  For now we attempt a multiindex with the dto and TP from above.
@@ -300,7 +356,8 @@ class wits_ftp():
                 #Ok, currently from release 0.7.3 of Pandas, manual page 88...
                 self.mult_idx = MultiIndex.from_tuples([(self.dto,self.TP)], names=['dto', 'TP'])  #first we have to create a multi-index 
                 #Do a stats series
-                self.stats = Series([self.l5.idxmax(), self.l5.max(),self.l5.mean(),self.l5.idxmin(),self.l5.min(),self.l5.std(),self.l5.skew(),self.l5.kurt()], index=['Max GXP','Max $/MWh','Mean','Min GXP','Min $/MWh','Std','Skew','Kurt'])
+                self.stats = interval_stats(l5w)[l5w.columns[0]]
+                self.stats.name = None
                 self.last_l5_data = self.l5
                 self.last_r5_data = self.r5
                 self.last_i5_data = self.i5
@@ -309,27 +366,64 @@ class wits_ftp():
         if self.f['s']: #if summary data exists
             if isnull(self.f['p']) == False:
                 buf = StringIO.StringIO(self.f['s'])   #ok, this is a string buffer straight from the ftp
-                self.s5 = read_csv(buf, names = self.colnames['s'])   #read in the new live 5 data 
-                self.s5 = self.s5.reset_index().T.pop(0)  #reset index and convert to series 
-                self.s5 = self.s5.drop(['level_0', 'level_1' , 'level_2' , 'Datetime']) #remove extra buff
+                self.s5 = parse_summary(buf, self.colnames['s'])   #read in the new live 5 data as a series
                 self.s5.name = self.dto  #and stamp with the dto   
     
     #############################################################################################################################################################################                            
-    def update_df(self,cropped_pickle_file,current_series,current_index,crop_days,crop_hours):          #Update function for cropped dataframes
+    def update_journal(self):    #append the new interval to the journal, the week DataFrames are replayed from it (see wits_journal.py)
+    #############################################################################################################################################################################                            
+        self.journal = wits_journal(self.wits_path)
+        self.journal.load()
+        if self.mult_idx is not None:
+            self.journal.append({'dto':self.dto,'TP':self.TP,'l5':self.l5,'i5':self.i5,'r5':self.r5,'s5':self.s5,'stats':self.stats})
+        self.checkpoint = self.checkpoint or self.journal.checkpoint
+        self.l5w, self.i5w, self.r5w, self.s5w, self.statsw = [self.journal.frames[x] for x in ['l5w','i5w','r5w','s5w','statsw']]
+
     #############################################################################################################################################################################                            
- 
-        if os.path.isfile(cropped_pickle_file):                  #if the file exists
-            cropped_df = read_pickle(cropped_pickle_file) #read the file
-            if list(current_index)[0] not in list(cropped_df.columns): #make sure current index not already in dataframe (when in 1 minute testing mode)		
-                cropped_df = cropped_df.join(DataFrame(current_series, columns=current_index))  #join current 5 minute series to cropped dataframe
-                cropped_df = self.crop_data(cropped_df,crop_days,crop_hours) #keep dataframe cropped by crop_days + crop_hours
-                cropped_df.to_pickle(cropped_pickle_file)    #save the cropped file
-            return cropped_df
-        else:
-            cropped_df = DataFrame(current_series, columns=current_index)   #create new DataFrame if on first iteration 
-            cropped_df.to_pickle(cropped_pickle_file)                       #and save
-            return cropped_df  
-      
+    def rebuild(self):    #week DataFrames, and all that is worked out from them, from the journal alone, i.e., after a crash
+    #############################################################################################################################################################################                            
+        self.checkpoint = True
+        self.update_journal()
+        self.dto, self.TP = self.l5w.columns[-1]
+        self.mult_idx = MultiIndex.from_tuples([(self.dto,self.TP)], names=['dto', 'TP'])
+        self.l5, self.i5, self.r5, self.s5, self.stats = [x[x.columns[-1]] for x in [self.l5w,self.i5w,self.r5w,self.s5w,self.statsw]]
+        self.l5.name = self.i5.name = self.r5.name = self.s5.name = self.dto
+        self.update_zoom()
+        self.update_surface()
+        self.update_summary()
+        self.update_prices()
+        self.spit_to_csv()
+
+    #############################################################################################################################################################################                            
+    def update_zoom(self):    #fold the latest intervals into the downsampled series for the horizon charts (see wits_zoom.py)
+    #############################################################################################################################################################################                            
+        if self.l5 is not None:
+            zoom = wits_zoom(self.wits_path)
+            zoom.load()
+            zoom.update({'all':self.l5w,'island':self.i5w,'region':self.r5w})   #everything since the last save, as that is only on a checkpoint
+            if self.checkpoint or zoom.rebuilt or not os.path.isfile(zoom.zoom_file):
+                zoom.save()
+            zoom.spit_to_bin()
+
+    #############################################################################################################################################################################                            
+    def update_surface(self):    #price surface over NZ for the map views (see wits_spatial.py)
+    #############################################################################################################################################################################                            
+        if self.l5 is not None:
+            spatial = wits_spatial(self.wits_path)
+            spatial.load_weights()
+            spatial.spit_to_bin(self.l5,self.dto)
+
+    #############################################################################################################################################################################                            
+    def update_summary(self):    #typed reserve/constraint store and binding event index (see wits_summary.py)
+    #############################################################################################################################################################################                            
+        if len(self.s5w.columns):
+            summary = wits_summary(self.wits_path)
+            summary.load()
+            summary.update(self.s5w)   #everything since the last save, as that is only on a checkpoint
+            if self.checkpoint or summary.rebuilt or not os.path.isfile(summary.summary_file):
+                summary.save()
+            summary.spit_to_bin()
+
     #############################################################################################################################################################################            
     def update_prices(self):    #Ok, report current prices, this seems way too long, and quite yuck really - sure this can be imporved in the future
     #############################################################################################################################################################################                    
@@ -358,13 +452,12 @@ class wits_ftp():
            self.ftp_get('s')             #get the summary file download
         self.ftp_quit()
         self.ftp_pandas()                #Ok, so we have the data, now process to pandas object
-        self.l5w = self.update_df(self.wits_path + 'l5w.pickle',self.l5,self.mult_idx,7,0)         #update pickled files
-        self.r5w = self.update_df(self.wits_path + 'r5w.pickle',self.r5,self.mult_idx,7,0)
-        self.i5w = self.update_df(self.wits_path + 'i5w.pickle',self.i5,self.mult_idx,7,0)
-        self.s5w = self.update_df(self.wits_path + 's5w.pickle',self.s5,self.mult_idx,7,0)
-        self.statsw = self.update_df(self.wits_path + 'statsw.pickle',self.stats,self.mult_idx,7,0)
+        self.update_journal()            #journal the new interval and get the week DataFrames
+        self.update_zoom()
+        self.update_surface()
+        self.update_summary()
         self.update_prices()
-        self.spit_to_csv()  #as the name suggests... we could add this to update_df --todo
+        self.spit_to_csv()  #as the name suggests...
 
     #############################################################################################################################################################################                            
     def spit_to_csv(self):    #Crop data and save 
@@ -380,48 +473,47 @@ class wits_ftp():
         i5w_d3 = ((i5w_hr.T)/100.0).reset_index(level=1).asfreq('5Min') #get rid of multi-index (Trading Periods), resample at 5min intervals, and fill NANs with zeros.
         r5w_d3 = ((r5w_hr.T)/100.0).reset_index(level=1).asfreq('5Min') 
         l5w_d3 = ((l5w_hr.T)/100.0).reset_index(level=1).asfreq('5Min') 
-        s5w_d3 = ((s5w_hr.T)/100.0).reset_index(level=1).asfreq('5Min') 
+        s5w_d3 = (s5w_hr.T).reset_index(level=1).asfreq('5Min') 
+        for name in RESERVE_PRICES: #only the reserve prices are scaled, MW and constraint counts are left in their own units
+            if name in s5w_d3:      #(no summary file yet, no columns)
+                s5w_d3[name] = s5w_d3[name]/100.0
         
         s5w_d3 = s5w_d3.rename(columns=dict(zip(s5w_d3.columns,s5w_d3.columns.map(lambda x: x.replace(' ','_')))))      
         s5w_d3 = s5w_d3.rename(columns=dict(zip(["NI_Fast_Reserve_Price","NI_Sustained_Reserve_Price","SI_Fast_Reserve_Price","SI_Sustained_Reserve_Price"],["NIFIR","NISIR","SIFIR","SISIR"])))
        
-        i5w_d3.to_csv(self.wits_path + 'island_week.csv',float_format='%.4f') 
-        r5w_d3.to_csv(self.wits_path + 'region_week.csv',float_format='%.4f')
-        l5w_d3.to_csv(self.wits_path + 'all_week.csv',float_format='%.4f')
-        s5w_d3.to_csv(self.wits_path + 'reserve_week.csv',float_format='%.4f')
+        write_csv(i5w_d3,self.wits_path + 'island_week.csv',float_format='%.4f') 
+        write_csv(r5w_d3,self.wits_path + 'region_week.csv',float_format='%.4f')
+        write_csv(l5w_d3,self.wits_path + 'all_week.csv',float_format='%.4f')
+        write_csv(s5w_d3,self.wits_path + 'reserve_week.csv',float_format='%.4f')
 
-        statsw_hr.T.to_csv(self.wits_path + 'stats_week.csv',float_format='%.4f') 
+        write_csv(statsw_hr.T,self.wits_path + 'stats_week.csv',float_format='%.4f') 
         #Dump just the current prices
         current_prices = DataFrame({'price':self.l5})
         current_prices = current_prices.reset_index().rename(columns={'index':'id'}).set_index('id').dropna()
         current_prices = current_prices[current_prices['price']>0]
-        current_prices.to_csv(self.wits_path + 'price.csv',float_format='%.2f') 
+        write_csv(current_prices,self.wits_path + 'price.csv',float_format='%.2f') 
+        #Binary columnar copies of the week data, unscaled, for dashboards and analysts (see wits_columnar.py)
+        write_columnar(self.wits_path + 'all_week.bin',l5w_hr)
+        write_columnar(self.wits_path + 'island_week.bin',i5w_hr)
+        write_columnar(self.wits_path + 'region_week.bin',r5w_hr)
         #Lets also groupby Trading periods and dump that to csv for the text alert system in mymailer.py
-        all_week = read_csv(self.wits_path + 'all_week.csv',index_col=[0,1],parse_dates=True)*100#.reset_index().set_index([[0,1]])*100.0
-        #print all_week.index
-        all_week['Date']=all_week.index.map(lambda x: x[0].date())
-        all_week_bytp = all_week.fillna(0).groupby(level=[0,1]).mean()
-        all_week_bytp.to_csv(self.wits_path + 'all_week_bytp.csv')
-        island_week = read_csv(self.wits_path + 'island_week.csv',index_col=[0,1],parse_dates=True)*100 #.reset_index().set_index([[0,1]])*100.0
-        island_week['Date']=island_week.index.map(lambda x: x[0].date())
-        island_week_bytp = island_week.fillna(0).groupby(level=[0,1]).mean()
-        island_week_bytp.to_csv(self.wits_path + 'island_week_bytp.csv')
-        region_week = read_csv(self.wits_path + 'region_week.csv',index_col=[0,1],parse_dates=True)*100 #.reset_index().set_index([[0,1]])*100.0
-        region_week['Date']=region_week.index.map(lambda x: x[0].date())
-        region_week_bytp = region_week.fillna(0).groupby(level=[0,1]).mean()
-        region_week_bytp.to_csv(self.wits_path + 'region_week_bytp.csv')
-
+        #(from the unscaled week data, rather than reading the /100 csv files back in and multiplying by 100)
+        all_week = self.week_5min(l5w_hr)
+        all_week_bytp = bytp(all_week)
+        write_csv(all_week_bytp,self.wits_path + 'all_week_bytp.csv')
+        island_week = self.week_5min(i5w_hr)
+        island_week_bytp = bytp(island_week)
+        write_csv(island_week_bytp,self.wits_path + 'island_week_bytp.csv')
+        region_week = self.week_5min(r5w_hr)
+        region_week_bytp = bytp(region_week)
+        write_csv(region_week_bytp,self.wits_path + 'region_week_bytp.csv')
 
     #############################################################################################################################################################################                            
-    def crop_data(self,data,days,hours):        #First we check the working directory for an existing live5.h5 
+    def week_5min(self,week):   #(dto,TP) indexed week frame at 5min intervals, i.e., the week csv files as read back in, without the /100 scaling
     #############################################################################################################################################################################                            
+        return week.T.reset_index(level=1).asfreq('5Min').set_index('TP',append=True)
+
 
-        dataT = data.T #Transpose data
-        lastest_data = data.columns[-1] #the lastest dispatch time stamp in the h5 file
-        lastest_date = lastest_data[0].date() #latest date
-        cropped_data  = dataT[dataT.index.levels[0]>=(lastest_data[0]-(dt.timedelta(days = days,hours=hours)))]        
-        return cropped_data.T 
-        
     #############################################################################################################################################################################                            
     def report_prices(self):
     #############################################################################################################################################################################                            
@@ -437,6 +529,10 @@ msg_len = 194
 if __name__ == '__main__':
     time1 = dt.datetime.now() 
     ftp_data = wits_ftp(cmd_line.ftp_host,cmd_line.ftp_user,cmd_line.ftp_pass,cmd_line.wits_path)  #create class instance
+    if cmd_line.rebuild:
+        ftp_data.rebuild()
+        logger.info('Rebuilt from the journal up to %s in %.1fs' % (ftp_data.dto,(dt.datetime.now() - time1).total_seconds()))
+        sys.exit()
     ftp_data.ftp_data_process() #FTP the wits server and get the lastest 5 minute data
     time2 = dt.datetime.now()
     ftp_data.report_prices() 
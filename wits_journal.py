@@ -0,0 +1,307 @@
+'''
+wits_journal - crash safe, append only journal of the parsed five minute intervals, with periodic snapshots
+
+Copyright (C) 2013, Electricty Authority, New Zealand.
+
+License, see https://github.com/ElectricityAuthority/LICENSE/blob/master/LICENSE.md
+
+wits_ftp_opsys.py used to keep the week (l5w, i5w, r5w, s5w and statsw) as five pickles, each read, joined and written
+out again in full every five minutes.  A crash or power cut half way through a write could lose the week, and getting
+it back means downloading it all again from WITS through the proxy.
+
+Instead, each parsed interval (the GXP, island and region prices, the summary file and the interval stats) is written
+once, as one record appended to the end of the current journal segment (journal_000012.bin):
+
+    bytes 0-7     magic 'WITSJNL1' (start of each segment only)
+    then, for each record:
+    bytes 0-3     payload length L (little endian uint32)
+    bytes 4-7     crc32 of the payload
+    bytes 8-8+L   zlib compressed pickle of {'dto','TP','l5','i5','r5','s5','stats'}, each series as its index and values
+
+and flushed to disk (fsync) before anything else is written, along with the directory when a new segment is started.
+Every SNAPSHOT_EVERY records (a day) the week frames are written (atomically, the rename synced) to
+journal_snapshot.pickle, along with the number of the segment that follows them, and only then are the older segments
+removed.  On start up the week frames are the last snapshot plus the records after it.  A short record or
+bad checksum ends the replay of a segment.  Only when what is left is less than a record header (a write cut short) is
+it cut off, so the next append follows the last good record.  The record length cannot be trusted once a record is bad,
+so for any other damage the segment is renamed aside, as is (journal_000012.bin.damaged, for a look), the records read
+before the damage go into a snapshot and appends carry on in a new segment.  A snapshot that cannot be read is renamed
+aside too (journal_snapshot.pickle.damaged) and the week is replayed from the segments left, on top of the week pickles
+of earlier versions if they are still there.  That is only the intervals since the damaged snapshot (up to a day), but
+the cron carries on rather than stopping on every run.
+
+The week frames, and everything worked out from them (the csv and .bin files), are derived from the journal, and can be
+rebuilt from it without going back to WITS.  The zoom levels (zoom.pickle) and reserve summary (summary.pickle) keep
+more than a week, so only their last week can be rebuilt from the journal (see wits_zoom.py and wits_summary.py):
+
+python wits_ftp_opsys.py --rebuild --wits_path=/home/dave/python/wits_ftp/
+
+To check the journal (and replay time), or to take a snapshot now:
+
+python wits_journal.py --wits_path=/home/dave/python/wits_ftp/ [--snapshot]
+
+'''
+import os
+import re
+import glob
+import time
+import zlib
+import struct
+try:
+    import cPickle as pickle   #the journal replay is mostly unpickling
+except ImportError:
+    import pickle
+import datetime as dt
+import numpy as np
+from pandas import *
+import logging
+import argparse
+
+#############################################################################################################################################################################
+#Setup command line option and argument parsing
+#############################################################################################################################################################################
+parser = argparse.ArgumentParser(add_help=False)
+parser.add_argument('--wits_path', action="store",dest='wits_path',default='/home/dave/python/wits_ftp/')
+parser.add_argument('--snapshot', action="store_true",dest='snapshot',default=False)
+if __name__ == '__main__':
+    cmd_line = parser.parse_args()
+
+#############################################################################################################################################################################
+#Setup logging
+#############################################################################################################################################################################
+
+if __name__ == '__main__':
+    formatter = logging.Formatter('|%(asctime)-6s|%(message)s|','%Y-%m-%d %H:%M')
+    consoleLogger = logging.StreamHandler()
+    consoleLogger.setLevel(logging.INFO)
+    consoleLogger.setFormatter(formatter)
+    logging.getLogger('').addHandler(consoleLogger)
+logger = logging.getLogger('WITS JOURNAL')
+logger.setLevel(logging.INFO)
+
+#############################################################################################################################################################################
+#Exception class pass...
+#############################################################################################################################################################################
+
+class JournalRecordError(Exception): pass
+
+MAGIC = 'WITSJNL1'
+RECORD = struct.Struct('<II')   #payload length, crc32
+SNAPSHOT_EVERY = 288    #records (one day of intervals) between snapshots
+WEEK_DAYS = 7           #the week frames are cropped to this
+FRAMES = [('l5w','l5'),('i5w','i5'),('r5w','r5'),('s5w','s5'),('statsw','stats')]  #week frame, and the wits_ftp series it is made of
+
+def interval(record):     #journal form of one interval {'dto','TP','l5','i5','r5','s5','stats'}, each series as (index, values)
+    payload = {'dto':Timestamp(record['dto']).to_pydatetime(),'TP':int(record['TP'])}
+    for frame_name,key in FRAMES:
+        series = record.get(key)
+        if series is not None:
+            if series.dtype == object:   #mixed series (summary, stats) as plain python values
+                values = [x.item() if isinstance(x,np.generic) else x for x in series.values]
+            else:
+                values = series.values
+            payload[key] = ([str(x) for x in series.index],values)
+    return payload
+
+def encode(payload):     #one journal record: length, crc32 and the compressed payload
+    data = zlib.compress(pickle.dumps(payload,2))
+    return RECORD.pack(len(data),zlib.crc32(data) & 0xffffffff) + data
+
+def decode(data):
+    return pickle.loads(zlib.decompress(data))
+
+def sync_dir(path):     #sync a directory, so a file created or renamed in it is still there after a power cut
+    fd = os.open(path or '.',os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+def write_pickle(filename,state):     #pickle state to filename, synced to disk before it is renamed over the old one, and the rename synced
+    f = open(filename + '.tmp','wb')
+    pickle.dump(state,f,pickle.HIGHEST_PROTOCOL)
+    f.flush()
+    os.fsync(f.fileno())
+    f.close()
+    os.rename(filename + '.tmp',filename)
+    sync_dir(os.path.dirname(filename))
+
+class wits_journal():
+
+    def __init__(self,wits_path,snapshot_every=SNAPSHOT_EVERY,days=WEEK_DAYS):
+        self.wits_path = wits_path
+        self.snapshot_file = wits_path + 'journal_snapshot.pickle'
+        self.snapshot_every = snapshot_every
+        self.days = days
+        self.frames = dict((frame_name,DataFrame()) for frame_name,key in FRAMES)  #the week frames, names x (dto,TP)
+        self.segment = 0        #segment being appended to, everything before it is in the snapshot
+        self.records = 0        #records since the snapshot
+        self.last = None        #latest interval (dto), so an interval is never journaled twice
+        self.checkpoint = False #a snapshot was written this run
+
+    #############################################################################################################################################################################
+    def segment_file(self,segment):
+    #############################################################################################################################################################################
+        return self.wits_path + 'journal_%06i.bin' % segment
+
+    #############################################################################################################################################################################
+    def segments(self):     #numbers of the segments on disk, in order
+    #############################################################################################################################################################################
+        found = [re.search(r'journal_(\d+)\.bin$',f) for f in glob.glob(self.wits_path + 'journal_*.bin')]
+        return sorted(int(m.group(1)) for m in found if m)
+
+    #############################################################################################################################################################################
+    def read_segment(self,segment):     #the good records of a segment, the byte offset just past the last of them, and whether the rest is only a torn header
+    #############################################################################################################################################################################
+        data = open(self.segment_file(segment),'rb').read()
+        records = []
+        if data[:len(MAGIC)] != MAGIC:
+            if len(data) >= len(MAGIC):
+                logger.error('Journal segment %s has no header, skipped' % self.segment_file(segment))
+            return records, 0, len(data) < len(MAGIC)
+        offset = len(MAGIC)
+        while offset < len(data):
+            if offset + RECORD.size > len(data):   #header cut short, the end of the file for sure
+                return records, offset, True
+            length,crc = RECORD.unpack_from(data,offset)
+            end = offset + RECORD.size + length
+            try:
+                payload = data[offset + RECORD.size:end]
+                if len(payload) < length or zlib.crc32(payload) & 0xffffffff != crc:
+                    raise JournalRecordError('bad record at byte %i of %s' % (offset,self.segment_file(segment)))
+                records.append(decode(payload))
+            except Exception, e:   #a bad length may be a flipped bit as well as a short write, so the rest is not known to be the tail
+                logger.error('Journal replay stopped: %s' % e)
+                return records, offset, False
+            offset = end
+        return records, offset, False
+
+    #############################################################################################################################################################################
+    def load(self):     #the week frames from the last snapshot and the journal records since
+    #############################################################################################################################################################################
+        snapshot = False   #write one once the records are replayed
+        if os.path.isfile(self.snapshot_file):
+            try:
+                state = pickle.load(open(self.snapshot_file,'rb'))
+                self.frames, self.segment, self.last = state['frames'], state['segment'], state['last']
+            except Exception, e:   #i.e., a bad block, set it aside (for a look) and start again from the segments still on disk
+                logger.error('Unable to read %s (%s), renamed to %s.damaged, week replayed from the journal segments left' % (self.snapshot_file,e,self.snapshot_file))
+                os.rename(self.snapshot_file,self.snapshot_file + '.damaged')
+                self.load_pickles()   #and the week pickles, if they are still about, for the intervals before those segments
+                snapshot = True
+        elif not self.segments():
+            snapshot = self.load_pickles()
+        records = []
+        for segment in self.segments():
+            if segment < self.segment:   #left over from a snapshot cut short, already in the snapshot
+                os.remove(self.segment_file(segment))
+                continue
+            good,offset,torn = self.read_segment(segment)
+            records.extend(good)
+            self.segment = segment
+            if torn:   #cut the torn tail off, so the next record follows the last good one
+                logger.error('Journal %s cut back to %i bytes' % (self.segment_file(segment),offset))
+                f = open(self.segment_file(segment),'r+b')
+                f.truncate(offset)
+                f.close()
+            elif os.path.getsize(self.segment_file(segment)) > offset:   #damaged, set it aside (for a look) and carry on in a new segment
+                logger.error('Journal %s damaged at byte %i, renamed to %s.damaged' % (self.segment_file(segment),offset,self.segment_file(segment)))
+                os.rename(self.segment_file(segment),self.segment_file(segment) + '.damaged')
+                self.segment = segment + 1
+                snapshot = True   #the good records of a damaged segment are only in memory now
+        self.records = len(records)
+        self.fold(records)
+        if snapshot:
+            self.snapshot()
+
+    #############################################################################################################################################################################
+    def load_pickles(self):     #start from the week pickles of earlier versions of wits_ftp_opsys.py, if there are any (True if there were)
+    #############################################################################################################################################################################
+        if os.path.isfile(self.wits_path + 'l5w.pickle'):
+            for frame_name,key in FRAMES:
+                if os.path.isfile(self.wits_path + frame_name + '.pickle'):
+                    self.frames[frame_name] = read_pickle(self.wits_path + frame_name + '.pickle')
+            self.last = self.frames['l5w'].columns[-1][0]
+            logger.info('Journal started from the week pickles, up to %s' % self.last)
+            return True
+        return False
+
+    #############################################################################################################################################################################
+    def fold(self,records):     #join any records newer than self.last onto the week frames, and crop them to self.days
+    #############################################################################################################################################################################
+        records = [r for r in records if self.last is None or r['dto'] > self.last]
+        if not records:
+            return
+        columns = MultiIndex.from_tuples([(r['dto'],r['TP']) for r in records],names=['dto','TP'])
+        for frame_name,key in FRAMES:
+            week = self.frames[frame_name]
+            have = [r[key] for r in records if key in r]
+            names = list(week.index)   #the names of the week, and any new ones (i.e., the summary fields after a start with no summary file)
+            known = set(names)
+            for index,values in have:
+                if index != names:
+                    names.extend([x for x in index if x not in known])
+                    known.update(index)
+            if len(names) > len(week.index) and len(week.columns):
+                week = week.reindex(names)
+            if all(isinstance(values,np.ndarray) for index,values in have):
+                new = np.empty((len(names),len(records)),dtype=np.result_type(float,*[values for index,values in have]))
+            else:
+                new = np.empty((len(names),len(records)),dtype=object)
+            new.fill(np.nan)
+            for i,r in enumerate(records):   #one column per interval, lined up on the names of the week
+                if key in r:
+                    index,values = r[key]
+                    new[:,i] = values if index == names else Series(values,index=index,dtype=new.dtype).reindex(names).values
+            new = DataFrame(new,index=names,columns=columns)
+            week = concat([week,new],axis=1) if len(week.columns) else new
+            dtos = DatetimeIndex(week.columns.get_level_values(0))
+            self.frames[frame_name] = week.iloc[:,np.flatnonzero(dtos >= records[-1]['dto'] - dt.timedelta(days=self.days))]
+        self.last = records[-1]['dto']
+
+    #############################################################################################################################################################################
+    def append(self,record):     #journal one interval {'dto','TP','l5','i5','r5','s5','stats'} and add it to the week frames
+    #############################################################################################################################################################################
+        if self.last is not None and record['dto'] <= self.last:   #already have it (i.e., in 1 minute testing mode)
+            return False
+        f = open(self.segment_file(self.segment),'ab')
+        created = f.tell() == 0
+        if created:
+            f.write(MAGIC)
+        payload = interval(record)
+        f.write(encode(payload))
+        f.flush()
+        os.fsync(f.fileno())
+        f.close()
+        if created:   #a new segment is only there for good once its directory entry is
+            sync_dir(self.wits_path)
+        self.records = self.records + 1
+        self.fold([payload])
+        if self.records >= self.snapshot_every:
+            self.snapshot()
+        return True
+
+    #############################################################################################################################################################################
+    def snapshot(self):     #write the week frames, start a new segment and remove the old ones
+    #############################################################################################################################################################################
+        segment = self.segment + 1
+        write_pickle(self.snapshot_file,{'frames':self.frames,'segment':segment,'last':self.last})  #renamed and synced, from here on the old segments are not needed
+        for old in self.segments():
+            if old < segment:
+                os.remove(self.segment_file(old))
+        self.segment = segment
+        self.records = 0
+        self.checkpoint = True
+
+#############################################################################################################################################################################
+#Start the programme
+#############################################################################################################################################################################
+
+if __name__ == '__main__':
+    time1 = time.time()
+    journal = wits_journal(cmd_line.wits_path)
+    journal.load()
+    logger.info('Replayed %i records on the snapshot in %.3fs, %i intervals up to %s' % (journal.records,time.time() - time1,len(journal.frames['l5w'].columns),journal.last))
+    if cmd_line.snapshot:
+        journal.snapshot()
+        logger.info('Snapshot written, now appending to %s' % journal.segment_file(journal.segment))
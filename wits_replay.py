@@ -0,0 +1,236 @@
+'''
+wits_replay - backtest the spot price text alerts against stored WITS 5 minute price files
+
+Copyright (C) 2013, Electricty Authority, New Zealand.
+
+License, see https://github.com/ElectricityAuthority/LICENSE/blob/master/LICENSE.md
+
+The GXP_trigger and Island_trigger levels in mymailer.py were set by guesswork.  This script replays a directory of stored
+WITS 5 minute price files (5minprices_YYYYMMDDHHMMxx.csv.gz, as kept in wits_path/history/ by wits_ftp_opsys.py each
+cycle, or any other download of them) through the same parse, aggregate and statistics functions as wits_ftp_opsys.py,
+and the same alert test as mymailer.py, for a grid of trigger levels.  Where an interval turns up in more than one file
+(republished with another xx suffix, or as .csv next to .csv.gz) the first is used, in file name order (the lowest xx
+suffix, which is the one the cron downloads), or the one already cached.  This is the rule of the cron itself: once an
+interval is journaled, a later copy of it is ignored (see wits_journal.append), so the backtest sees the prices
+mymailer.py saw.
+
+Rather than pushing one file at a time through the cron scripts, all files are parsed in large batches and each trigger
+level is tested against every trading period at once (numpy arrays).  The parsed history is cached in replay.pickle, so
+only new files are read on the next run and a year of data sweeps in seconds.  A file that cannot be read or parsed is
+logged and left out of the cache, so it is tried again on the next run; a malformed file only costs its batch a second,
+file by file, parse.
+
+mymailer.py runs at 22 and 52 minutes past the hour and, with the 15 minute FTP lag, its last complete row is the
+interval at 0 or 30 minutes past the hour.  Only those intervals are tested by default (see --alert_minutes).
+
+Example:
+
+python wits_replay.py --history_path=/home/dave/python/wits_ftp/history/ --GXP_triggers=500:2000:250 --Island_triggers=300,500,800
+
+Writes replay_summary.csv (alert count, first and last alert for each trigger pair) and replay_alerts.csv (when each
+alert would have been sent) to --wits_path, along with all_history.bin, a binary columnar copy of the parsed GXP prices.
+
+'''
+import datetime as dt
+import StringIO
+import pickle
+import glob
+import gzip
+import sys, os
+import time
+import numpy as np
+from pandas import *
+import logging
+import argparse
+from wits_ftp_opsys import wits_ftp, parse_prices, aggregate_prices, interval_stats, bytp
+from mymailer import triggered
+from wits_columnar import write_columnar
+
+#############################################################################################################################################################################
+#Setup command line option and argument parsing
+#############################################################################################################################################################################
+parser = argparse.ArgumentParser(add_help=False)
+parser.add_argument('--history_path', action="store",dest='history_path',default='/home/dave/python/wits_ftp/history/')
+parser.add_argument('--wits_path', action="store",dest='wits_path',default='/home/dave/python/wits_ftp/')
+parser.add_argument('--GXP_triggers', action="store",dest='GXP_triggers',default='1000')    #comma list, or start:stop:step
+parser.add_argument('--Island_triggers', action="store",dest='Island_triggers',default='500')
+parser.add_argument('--alert_minutes', action="store",dest='alert_minutes',default='0,30')  #interval minutes mymailer.py sees, use 'all' for every interval
+parser.add_argument('--batch', action="store",dest='batch',default=2000)                    #files parsed per read_csv call
+if __name__ == '__main__':
+    cmd_line = parser.parse_args()
+
+#############################################################################################################################################################################
+#Setup logging
+#############################################################################################################################################################################
+
+if __name__ == '__main__':
+    formatter = logging.Formatter('|%(asctime)-6s|%(message)s|','%Y-%m-%d %H:%M')
+    consoleLogger = logging.StreamHandler()
+    consoleLogger.setLevel(logging.INFO)
+    consoleLogger.setFormatter(formatter)
+    logging.getLogger('').addHandler(consoleLogger)
+logger = logging.getLogger('WITS REPLAY')
+logger.setLevel(logging.INFO)
+
+#############################################################################################################################################################################
+#Exception class pass...
+#############################################################################################################################################################################
+
+class HistoryFileError(Exception): pass
+
+def trigger_grid(text):     #'500,1000,2000' or '500:2000:250' (stop inclusive) to a list of trigger levels
+    if ':' in text:
+        start,stop,step = [float(x) for x in text.split(':')]
+        return list(np.arange(start,stop+step/2.0,step))
+    return [float(x) for x in text.split(',')]
+
+class wits_replay():
+
+    def __init__(self,history_path,wits_path,alert_minutes,batch):
+        self.history_path = history_path
+        self.wits_path = wits_path
+        self.cache_file = wits_path + 'replay.pickle'
+        self.alert_minutes = alert_minutes   #None for every interval
+        self.batch = int(batch)
+        self.wits = wits_ftp(None,None,None,wits_path) #for colnames and lmt, so we parse exactly as the cron script does
+        self.files = []   #history files already parsed
+        self.l5w = DataFrame()  #GXP x (dto,TP) price frame for the whole history
+        self.i5w = DataFrame()  #island x (dto,TP)
+        self.r5w = DataFrame()  #region x (dto,TP)
+        self.l5bytp = None
+        self.i5bytp = None
+        self.stats = None
+        self.summary = None
+        self.alerts = None
+
+    #############################################################################################################################################################################
+    def read_file(self,filename):     #text of one stored 5 minute price file, None if it cannot be read
+    #############################################################################################################################################################################
+        try:
+            if filename.endswith('.gz'):
+                f = gzip.open(filename,'rb')
+            else:
+                f = open(filename,'rb')
+            try:
+                return f.read()
+            finally:
+                f.close()
+        except IOError:
+            error_text = 'Unable to read %s --> skipping' % filename
+            logger.error(error_text)
+            HistoryFileError(error_text)
+            return None
+
+    #############################################################################################################################################################################
+    def load_history(self):     #parse any history files not already in replay.pickle, in batches
+    #############################################################################################################################################################################
+        if os.path.isfile(self.cache_file):
+            cache = pickle.load(open(self.cache_file,'rb'))
+            self.files, self.l5w, self.i5w, self.r5w = cache['files'], cache['l5w'], cache['i5w'], cache['r5w']
+        done = set(self.files)
+        new_files = [f for f in sorted(glob.glob(self.history_path + '5minprices_[0-9]*.csv*')) if os.path.basename(f) not in done]
+        logger.info('%i history files cached, %i new' % (len(self.files),len(new_files)))
+        frames = {'l5w':[],'i5w':[],'r5w':[]}
+        if self.files:
+            frames = {'l5w':[self.l5w],'i5w':[self.i5w],'r5w':[self.r5w]}
+        parsed = []   #only files that were read and parsed are cached, the rest are tried again next run
+        for i in range(0,len(new_files),self.batch):
+            texts = [(f,self.read_file(f)) for f in new_files[i:i+self.batch]]
+            for files,(l5w,i5w,r5w) in self.parse_batch([(f,t) for f,t in texts if t is not None]):
+                frames['l5w'].append(l5w)
+                frames['i5w'].append(i5w)
+                frames['r5w'].append(r5w)
+                parsed = parsed + files
+        if parsed:   #an interval republished in a later batch (or file) is dropped, the earlier one is kept
+            self.l5w, self.i5w, self.r5w = [self.combine(frames[x]) for x in ['l5w','i5w','r5w']]
+            self.files = self.files + [os.path.basename(f) for f in parsed]
+            pickle.dump({'files':self.files,'l5w':self.l5w,'i5w':self.i5w,'r5w':self.r5w},open(self.cache_file,'wb'),pickle.HIGHEST_PROTOCOL)
+            write_columnar(self.wits_path + 'all_history.bin',self.l5w)   #the whole history, for analysts (see wits_columnar.py)
+
+    #############################################################################################################################################################################
+    def parse_batch(self,texts):     #[(files, (l5w, i5w, r5w))] for a batch of (file, text): in one go, or if that fails, file by file, skipping any that fail
+    #############################################################################################################################################################################
+        parse = lambda text: aggregate_prices(parse_prices(StringIO.StringIO(text),self.wits.colnames['p'],self.wits.lmt))
+        if not texts:
+            return []
+        try:
+            return [([f for f,t in texts],parse(''.join([t for f,t in texts])))]
+        except Exception, e:   #one malformed file fails the whole read_csv
+            logger.error('Unable to parse a batch of %i files (%s) --> parsing them one at a time' % (len(texts),e))
+        parsed = []
+        for f,t in texts:
+            try:
+                parsed.append(([f],parse(t)))
+            except Exception, e:
+                error_text = 'Unable to parse %s (%s) --> skipping' % (f,e)
+                logger.error(error_text)
+                HistoryFileError(error_text)
+        return parsed
+
+    #############################################################################################################################################################################
+    def combine(self,frames):     #one (dto,TP) column per interval, the first parsed where an interval turns up more than once
+    #############################################################################################################################################################################
+        frame = concat(frames,axis=1)
+        return frame.loc[:,~frame.columns.duplicated(keep='first')].sort_index(axis=1)
+
+    #############################################################################################################################################################################
+    def prepare(self):     #trading period frames and statistics for the intervals mymailer.py would have looked at
+    #############################################################################################################################################################################
+        self.l5bytp = bytp(self.l5w.T)
+        self.i5bytp = bytp(self.i5w.T)
+        if self.alert_minutes is not None:
+            seen = np.array([x[0].minute in self.alert_minutes for x in self.l5bytp.index])
+            self.l5bytp = self.l5bytp[seen]
+            self.i5bytp = self.i5bytp.reindex(self.l5bytp.index)
+        self.stats = interval_stats(self.l5bytp.T).T
+
+    #############################################################################################################################################################################
+    def sweep(self,GXP_triggers,Island_triggers):     #count and time stamp the alerts for every pair of trigger levels
+    #############################################################################################################################################################################
+        gxp_max = self.l5bytp.max(axis=1).values
+        ni = self.i5bytp['NI'].values
+        si = self.i5bytp['SI'].values
+        summary = []
+        alerts = []
+        for GXP_trigger in GXP_triggers:
+            for Island_trigger in Island_triggers:
+                gxp_alert, island_alert = triggered(gxp_max,ni,si,GXP_trigger,Island_trigger)
+                sent = gxp_alert | island_alert
+                idx = self.l5bytp.index[sent]
+                summary.append({'GXP_trigger':GXP_trigger,'Island_trigger':Island_trigger,'alerts':sent.sum(),
+                                'GXP_alerts':gxp_alert.sum(),'Island_alerts':island_alert.sum(),
+                                'first_alert':idx[0][0] if len(idx) else None,'last_alert':idx[-1][0] if len(idx) else None})
+                for (dto,TP),g,i in zip(idx,gxp_alert[sent],island_alert[sent]):
+                    alerts.append({'GXP_trigger':GXP_trigger,'Island_trigger':Island_trigger,'dto':dto,'TP':TP,'GXP':g,'Island':i})
+        self.summary = DataFrame(summary,columns=['GXP_trigger','Island_trigger','alerts','GXP_alerts','Island_alerts','first_alert','last_alert'])
+        self.alerts = DataFrame(alerts,columns=['GXP_trigger','Island_trigger','dto','TP','GXP','Island'])
+        if len(self.alerts):  #add the price detail mymailer.py would have texted
+            detail = self.stats[['Max GXP','Max $/MWh']].join(self.i5bytp[['NI','SI']])
+            self.alerts = self.alerts.join(detail,on=['dto','TP'])
+
+    #############################################################################################################################################################################
+    def spit_to_csv(self):
+    #############################################################################################################################################################################
+        self.summary.to_csv(self.wits_path + 'replay_summary.csv',index=False)
+        self.alerts.to_csv(self.wits_path + 'replay_alerts.csv',index=False,float_format='%.2f')
+
+#############################################################################################################################################################################
+#Start the programme
+#############################################################################################################################################################################
+
+if __name__ == '__main__':
+    if cmd_line.alert_minutes == 'all':
+        alert_minutes = None
+    else:
+        alert_minutes = [int(m) for m in cmd_line.alert_minutes.split(',')]
+    replay = wits_replay(cmd_line.history_path,cmd_line.wits_path,alert_minutes,cmd_line.batch)
+    time1 = time.time()
+    replay.load_history()
+    time2 = time.time()
+    replay.prepare()
+    replay.sweep(trigger_grid(cmd_line.GXP_triggers),trigger_grid(cmd_line.Island_triggers))
+    time3 = time.time()
+    replay.spit_to_csv()
+    logger.info('%i intervals loaded in %.1fs, %i trading periods x %i trigger pairs swept in %.2fs' % (len(replay.l5w.columns),time2-time1,len(replay.l5bytp),len(replay.summary),time3-time2))
+    for line in replay.summary.to_string(index=False).split('\n'):
+        logger.info(line)
@@ -0,0 +1,44 @@
+// wits_spatial.js - price surfaces over NZ from the GXP prices, using the interpolation weights written by wits_spatial.py
+// (spatial_weights.bin).  Needs wits_columnar.js.  Each surface is one pass over the sparse weights (K GXPs per cell), so
+// stepping an animation through every interval of all_week.bin costs a few milliseconds a frame.  The last limit surfaces
+// (48 by default, ~3.4MB) are kept, least recently used first out, so a looping animation does not hold the whole week.
+//
+//   witsColumnar("spatial_weights.bin", function(error, weights) {
+//     witsColumnar("all_week.bin", function(error, week) {
+//       var surface = witsSurface(weights, week);
+//       surface(week.n - 1)   Float32Array, grid.nlat rows (from grid.lat0) x grid.nlong columns (from grid.long0), NaN off shore
+//     });
+//   });
+
+function witsSurface(weights, week, limit) {
+  var k = weights.gxp.length / weights.n,
+      cells = weights.n,
+      rows = weights.names.map(function(name) { return name in week.index ? week.index[name] : -1; }), // weight GXP -> week row
+      cache = {},
+      used = [];  // cached intervals, least recently used first
+
+  if (!limit) limit = 48;
+
+  return function(i) {
+    if (i in cache) {
+      used.splice(used.indexOf(i), 1);
+      used.push(i);
+      return cache[i];
+    }
+    if (used.length >= limit) delete cache[used.shift()];
+    var surface = new Float32Array(cells);
+    for (var c = 0; c < cells; c++) {
+      var num = 0, den = 0;
+      for (var j = c * k; j < (c + 1) * k; j++) {
+        var w = weights.weight[j], row = rows[weights.gxp[j]];
+        if (!w || row < 0) continue;
+        var p = week.price[row * week.n + i];
+        if (isNaN(p)) continue;  // no price for this GXP, re-normalise over the rest
+        num += w * p, den += w;
+      }
+      surface[c] = den ? num / den : NaN;
+    }
+    used.push(i);
+    return cache[i] = surface;
+  };
+}
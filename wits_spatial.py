@@ -0,0 +1,126 @@
+'''
+wits_spatial - interpolated price surface over New Zealand from the GXP prices and coordinates
+
+Copyright (C) 2013, Electricty Authority, New Zealand.
+
+License, see https://github.com/ElectricityAuthority/LICENSE/blob/master/LICENSE.md
+
+price.csv (current GXP prices) and gxps_filtered.csv (GXP lat/long) are all the map pages have, so any spatial picture
+has to be interpolated from scratch in the browser every cycle (and every frame of an animation).
+
+The interpolation here is inverse distance weighting from the K nearest GXPs to each cell of a fixed lat/long grid over
+NZ (GRID, below).  The weights only depend on where the GXPs are, so they are worked out once per change to the GXP set
+and kept (spatial_weights.pickle) as a sparse matrix with K entries per cell, i.e., a GXP index and a weight.  Each price
+surface is then one sparse matrix-vector product, re-normalised for any GXP without a price in that interval:
+
+    surface = W.p / W.(p is not NaN)
+
+Cells further than MAX_KM from any GXP (the sea, mostly) are NaN.  Each cycle wits_ftp_opsys.py writes the current
+surface (price_surface.bin), and the weights (spatial_weights.bin) whenever they change, so the browser can build any
+interval of all_week.bin as a surface with the same product (wits_spatial.js), i.e., for a whole week animation.
+index4.html draws both over the GXP map.
+
+'''
+import os
+import pickle
+import numpy as np
+from pandas import *
+import logging
+from wits_columnar import write_columns, dto_seconds
+from wits_journal import write_pickle
+
+logger = logging.getLogger('WITS SPATIAL')
+logger.setLevel(logging.INFO)
+
+GRID = {'lat0':-47.5,'lat1':-34.0,'long0':166.0,'long1':179.0,'step':0.1}  #cell centres, degrees (~10km, 136 x 131 cells)
+K = 6           #nearest GXPs per cell
+POWER = 2       #inverse distance power
+MAX_KM = 75.0   #cells with no GXP within this distance are left blank (NaN)
+
+class wits_spatial():
+
+    def __init__(self,wits_path,gxp_file='gxps_filtered.csv'):
+        self.wits_path = wits_path
+        self.gxp_file = wits_path + gxp_file
+        self.weights_file = wits_path + 'spatial_weights.pickle'
+        self.lat = np.arange(GRID['lat0'],GRID['lat1'] + GRID['step']/2.0,GRID['step'])
+        self.long = np.arange(GRID['long0'],GRID['long1'] + GRID['step']/2.0,GRID['step'])
+        self.names = None   #GXP order of the weight matrix columns
+        self.idx = None     #cells x K GXP indices (into self.names)
+        self.w = None       #cells x K weights, rows sum to 1 (0 for blank cells)
+        self.changed = False  #weights rebuilt this run
+
+    #############################################################################################################################################################################
+    def key(self,gxps):     #the weights are rebuilt whenever this changes
+    #############################################################################################################################################################################
+        return (tuple(gxps.index),tuple(gxps.lat.round(6)),tuple(gxps.long.round(6)),tuple(sorted(GRID.items())),K,POWER,MAX_KM)
+
+    #############################################################################################################################################################################
+    def load_weights(self):     #from spatial_weights.pickle, or worked out again if the GXP set (gxps_filtered.csv) has changed
+    #############################################################################################################################################################################
+        gxps = read_csv(self.gxp_file,index_col=0)
+        key = self.key(gxps)
+        if os.path.isfile(self.weights_file):
+            try:
+                cached = pickle.load(open(self.weights_file,'rb'))
+                if cached['key'] == key:
+                    self.names, self.idx, self.w = cached['names'], cached['idx'], cached['w']
+                    return
+            except Exception, e:   #i.e., cut short by a power cut, work them out again
+                logger.error('Unable to read %s (%s), weights rebuilt' % (self.weights_file,e))
+        self.build_weights(gxps)
+        write_pickle(self.weights_file,{'key':key,'names':self.names,'idx':self.idx,'w':self.w})
+        self.changed = True
+
+    #############################################################################################################################################################################
+    def build_weights(self,gxps,chunk=4096):     #K nearest GXP inverse distance weights for every grid cell
+    #############################################################################################################################################################################
+        self.names = [str(x) for x in gxps.index]
+        lat, lng = np.meshgrid(self.lat,self.long,indexing='ij')
+        lat, lng = np.radians(lat.ravel()), np.radians(lng.ravel())
+        glat, glng = np.radians(gxps.lat.values), np.radians(gxps.long.values)
+        k = min(K,len(glat))
+        self.idx = np.zeros((len(lat),k),dtype='<u2')
+        self.w = np.zeros((len(lat),k),dtype='<f4')
+        for i in range(0,len(lat),chunk):   #cells x GXPs distances (haversine, km), a chunk of cells at a time
+            a = np.sin((glat[None,:] - lat[i:i+chunk,None])/2.0)**2 + \
+                np.cos(lat[i:i+chunk,None])*np.cos(glat[None,:])*np.sin((glng[None,:] - lng[i:i+chunk,None])/2.0)**2
+            km = 2*6371.0*np.arcsin(np.sqrt(a))
+            near = np.argsort(km,axis=1)[:,:k]
+            d = np.maximum(km[np.arange(len(km))[:,None],near],1e-3)
+            w = 1.0/d**POWER
+            w[d[:,0] > MAX_KM] = 0.0
+            total = w.sum(axis=1)
+            w[total > 0] = w[total > 0]/total[total > 0,None]
+            self.idx[i:i+chunk] = near
+            self.w[i:i+chunk] = w
+
+    #############################################################################################################################################################################
+    def surfaces(self,frame,chunk=64):     #price surfaces for every interval (column) of a GXP x interval frame, cells x intervals
+    #############################################################################################################################################################################
+        p = frame.reindex(self.names).values.astype(float)   #GXPs x intervals, NaN where a GXP has no price
+        have = ~np.isnan(p)
+        p = np.where(have,p,0.0)
+        out = np.empty((len(self.idx),p.shape[1]),dtype='<f4')
+        for c in range(0,p.shape[1],chunk):    #a chunk of intervals at a time, to keep memory down for a whole week
+            num = np.zeros((len(self.idx),len(p[0,c:c+chunk])))
+            den = np.zeros(num.shape)
+            for j in range(self.idx.shape[1]):    #the sparse product, one of the K entries per cell at a time
+                num += self.w[:,j,None]*p[self.idx[:,j],c:c+chunk]
+                den += self.w[:,j,None]*have[self.idx[:,j],c:c+chunk]
+            with np.errstate(invalid='ignore',divide='ignore'):
+                out[:,c:c+chunk] = num/den   #0/0 -> NaN for blank cells
+        return out
+
+    #############################################################################################################################################################################
+    def surface(self,prices):     #price surface (lat x long grid) for one GXP price series, i.e., wits_ftp.l5
+    #############################################################################################################################################################################
+        return self.surfaces(DataFrame({'price':prices})).reshape(len(self.lat),len(self.long))
+
+    #############################################################################################################################################################################
+    def spit_to_bin(self,prices,dto):     #price_surface.bin for the current interval, and spatial_weights.bin if the weights were rebuilt
+    #############################################################################################################################################################################
+        grid = dict(GRID,nlat=len(self.lat),nlong=len(self.long))
+        if self.changed or not os.path.isfile(self.wits_path + 'spatial_weights.bin'):
+            write_columns(self.wits_path + 'spatial_weights.bin',self.names,[('gxp',self.idx),('weight',self.w)],grid=grid)
+        write_columns(self.wits_path + 'price_surface.bin',self.names,[('dto',dto_seconds([dto])),('surface',self.surface(prices))],grid=grid)
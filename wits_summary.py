@@ -0,0 +1,198 @@
+'''
+wits_summary - typed store of the five minute summary file (reserves and constraints), indexed by binding events
+
+Copyright (C) 2013, Electricty Authority, New Zealand.
+
+License, see https://github.com/ElectricityAuthority/LICENSE/blob/master/LICENSE.md
+
+The 5 minute summary file ('s') has the reserve prices and MW, reserve deficits and the number of binding constraints of
+each type.  wits_ftp_opsys.py keeps it (s5w) as an untyped week frame, with everything divided by 100 on the way
+to reserve_week.csv.  Here each interval is kept for KEEP_DAYS with each field in its own type and units (counts as
+integers, MW and $/MWh as floats, NaN where the summary file had no value), along with an index, for each constraint
+type and reserve deficit, of the intervals where it was binding (count > 0) or in deficit (MW > 0).  So "when did SI
+sustained reserve go into deficit this year?" is a lookup in a sorted list rather than a scan of every interval:
+
+python wits_summary.py --event='SI Sustained Reserve Deficit' --start=2013-01-01
+
+Each cycle wits_ftp_opsys.py adds the new intervals of the week frame and writes the last week of the store to
+reserve_week.bin (see wits_columnar.py), one typed column per field, for the reserve charts (~150kB rather than ~8MB
+for the whole store).
+
+'''
+import os
+import pickle
+import datetime as dt
+import numpy as np
+from pandas import *
+import logging
+import argparse
+from wits_columnar import write_columns, dto_seconds
+from wits_journal import WEEK_DAYS, write_pickle
+
+#############################################################################################################################################################################
+#Setup command line option and argument parsing
+#############################################################################################################################################################################
+parser = argparse.ArgumentParser(add_help=False)
+parser.add_argument('--wits_path', action="store",dest='wits_path',default='/home/dave/python/wits_ftp/')
+parser.add_argument('--event', action="store",dest='event',default='SI Sustained Reserve Deficit')
+parser.add_argument('--start', action="store",dest='start',default=None)
+parser.add_argument('--stop', action="store",dest='stop',default=None)
+if __name__ == '__main__':
+    cmd_line = parser.parse_args()
+
+#############################################################################################################################################################################
+#Setup logging
+#############################################################################################################################################################################
+
+if __name__ == '__main__':
+    formatter = logging.Formatter('|%(asctime)-6s|%(message)s|','%Y-%m-%d %H:%M')
+    consoleLogger = logging.StreamHandler()
+    consoleLogger.setLevel(logging.INFO)
+    consoleLogger.setFormatter(formatter)
+    logging.getLogger('').addHandler(consoleLogger)
+logger = logging.getLogger('WITS SUMMARY')
+logger.setLevel(logging.INFO)
+
+#############################################################################################################################################################################
+#Exception class pass...
+#############################################################################################################################################################################
+
+class SummaryEventError(Exception): pass
+
+CONSTRAINTS = ['Ramp Up Cons','Ramp Down Cons','Branch Cons','Branch Group Cons','GIP/GXP Group Cons','Market Node Group Cons','GIP/GXP Deficit']  #counts
+DEFICITS = ['NI Fast Reserve Deficit','NI Sustained Reserve Deficit','SI Fast Reserve Deficit','SI Sustained Reserve Deficit']  #MW
+RESERVE_PRICES = {'NI Fast Reserve Price':'NIFIR','NI Sustained Reserve Price':'NISIR','SI Fast Reserve Price':'SIFIR','SI Sustained Reserve Price':'SISIR'}  #$/MWh, and their reserve_week.csv names
+FIELDS = {}   #summary field -> dtype, every field of wits_ftp.colnames['s'] except Datetime
+for name in CONSTRAINTS:
+    FIELDS[name] = '<u2'
+for name in ['GXP Integrity','NI Fast Reserve MW','NI Sustained Reserve MW','SI Fast Reserve MW','SI Sustained Reserve MW'] + list(RESERVE_PRICES) + DEFICITS:
+    FIELDS[name] = '<f4'
+EVENTS = CONSTRAINTS + DEFICITS   #fields indexed when > 0
+KEEP_DAYS = 400
+
+def parse_summary(buf,names):     #the summary file as a Series of its fields (as wits_ftp.s5, before the dto stamp)
+    s5 = read_csv(buf, names = names)   #read in the new live 5 data
+    s5 = s5.reset_index().T.pop(0)  #reset index and convert to series
+    return s5.drop(['level_0', 'level_1' , 'level_2' , 'Datetime']) #remove extra buff
+
+def units(name):
+    if name in CONSTRAINTS:
+        return 'count'
+    if name in RESERVE_PRICES:
+        return '$/MWh'
+    if name == 'GXP Integrity':
+        return ''
+    return 'MW'
+
+def csv_name(name):     #column name as used in reserve_week.csv (and the reserve charts)
+    return RESERVE_PRICES.get(name,name.replace(' ','_'))
+
+class wits_summary():
+
+    def __init__(self,wits_path):
+        self.wits_path = wits_path
+        self.summary_file = wits_path + 'summary.pickle'
+        self.fields = sorted(FIELDS)
+        self.data = self.empty()     #dto indexed, one typed column per field, plus TP
+        self.events = dict((name,DatetimeIndex([])) for name in EVENTS)  #event -> sorted intervals where it was binding/in deficit
+        self.rebuilt = False  #summary.pickle could not be read and the store started again, so save it
+
+    #############################################################################################################################################################################
+    def empty(self):
+    #############################################################################################################################################################################
+        data = DataFrame(dict((name,np.array([],dtype=FIELDS[name])) for name in self.fields), index=DatetimeIndex([]), columns=self.fields)
+        data['TP'] = np.array([],dtype='<u1')
+        return data
+
+    #############################################################################################################################################################################
+    def load(self):
+    #############################################################################################################################################################################
+        if os.path.isfile(self.summary_file):
+            try:
+                state = pickle.load(open(self.summary_file,'rb'))
+                self.data, self.events = state['data'], state['events']
+            except Exception, e:   #i.e., cut short by a power cut, start again empty (update then adds the week)
+                logger.error('Unable to read %s (%s), summary store started again' % (self.summary_file,e))
+                self.rebuilt = True
+
+    #############################################################################################################################################################################
+    def save(self):
+    #############################################################################################################################################################################
+        write_pickle(self.summary_file,{'data':self.data,'events':self.events})
+
+    #############################################################################################################################################################################
+    def update(self,week):     #add any new intervals of the s5w week frame (fields x (dto,TP)) with their types, and index any binding events
+    #############################################################################################################################################################################
+        if week is None or len(week.columns) == 0 or not set(self.fields) <= set(week.index):   #no summary files (yet)
+            return
+        dtos = DatetimeIndex(week.columns.get_level_values(0))
+        new = np.ones(len(dtos),dtype=bool) if not len(self.data) else np.asarray(dtos > self.data.index[-1])
+        rows = DataFrame(week.values[:,new].T, index=dtos[new], columns=week.index)[self.fields].astype(float)
+        TP = week.columns.get_level_values(1)[new][rows.notnull().any(axis=1).values]
+        rows = rows[rows.notnull().any(axis=1)]   #no summary file for that interval
+        if not len(rows):
+            return
+        data = DataFrame(dict((name,self.typed(name,rows[name])) for name in self.fields), index=rows.index, columns=self.fields)
+        data['TP'] = np.asarray(TP,dtype='<u1')
+        self.data = concat([self.data,data])
+        for name in EVENTS:
+            with np.errstate(invalid='ignore'):   #a missing deficit (NaN) is not an event
+                self.events[name] = self.events[name].append(data.index[data[name].values > 0])
+        cutoff = data.index[-1] - dt.timedelta(days=KEEP_DAYS)
+        if self.data.index[0] < cutoff:
+            self.data = self.data[self.data.index >= cutoff]
+            for name in EVENTS:
+                self.events[name] = self.events[name][self.events[name] >= cutoff]
+
+    #############################################################################################################################################################################
+    def typed(self,name,values):     #one field in its own type, a missing MW or price stays NaN, a missing count is 0 (integers have no NaN)
+    #############################################################################################################################################################################
+        if FIELDS[name] == '<u2':
+            values = values.fillna(0)
+        return values.values.astype(FIELDS[name])
+
+    #############################################################################################################################################################################
+    def when(self,event,start=None,stop=None):     #intervals between start and stop where event was binding or in deficit (an index lookup)
+    #############################################################################################################################################################################
+        if event not in self.events:
+            raise SummaryEventError('%s is not one of %s' % (event,', '.join(EVENTS)))
+        times = self.events[event]
+        lo = 0 if start is None else times.searchsorted(Timestamp(start))
+        hi = len(times) if stop is None else times.searchsorted(Timestamp(stop))
+        return times[lo:hi]
+
+    #############################################################################################################################################################################
+    def episodes(self,event,start=None,stop=None):     #runs of consecutive five minute intervals from when(), with the peak value of each
+    #############################################################################################################################################################################
+        times = self.when(event,start,stop)
+        if not len(times):
+            return DataFrame(columns=['start','end','intervals','peak'])
+        breaks = np.diff(times.asi8) > 5*60*10**9
+        run = np.concatenate([[0],np.cumsum(breaks)])
+        values = self.data[event].reindex(times).values
+        g = DataFrame({'time':times,'value':values,'run':run}).groupby('run')
+        return DataFrame({'start':g.time.first(),'end':g.time.last(),'intervals':g.time.count(),'peak':g.value.max()},columns=['start','end','intervals','peak'])
+
+    #############################################################################################################################################################################
+    def spit_to_bin(self):     #reserve_week.bin, the last week with one typed column per field, for the reserve charts
+    #############################################################################################################################################################################
+        if not len(self.data):
+            return
+        week = self.data[self.data.index > self.data.index[-1] - dt.timedelta(days=WEEK_DAYS)]
+        columns = [('dto',dto_seconds(week.index)),('TP',week.TP.values.astype('<u1'))]
+        for name in self.fields:
+            columns.append((csv_name(name),week[name].values.astype(FIELDS[name])))
+        write_columns(self.wits_path + 'reserve_week.bin',[csv_name(name) for name in self.fields],columns,units=dict((csv_name(name),units(name)) for name in self.fields))
+
+#############################################################################################################################################################################
+#Start the programme
+#############################################################################################################################################################################
+
+if __name__ == '__main__':
+    summary = wits_summary(cmd_line.wits_path)
+    summary.load()
+    episodes = summary.episodes(cmd_line.event,cmd_line.start,cmd_line.stop)
+    logger.info('%s: %i intervals in %i episodes' % (cmd_line.event,episodes.intervals.sum(),len(episodes)))
+    if len(episodes):
+        for line in episodes.to_string(index=False).split('\n'):
+            logger.info(line)
@@ -0,0 +1,226 @@
+'''
+wits_zoom - multi-zoom, shape preserving downsampled price series for the cubism horizon charts
+
+Copyright (C) 2013, Electricty Authority, New Zealand.
+
+License, see https://github.com/ElectricityAuthority/LICENSE/blob/master/LICENSE.md
+
+all_prices.html draws every GXP from the full five minute all_week.csv and cubism then squeezes ~2000 points per GXP into
+the chart width on every render.  Anything longer than a week is out of the question that way.
+
+Instead, every GXP, island and region series is kept at several zoom levels (ZOOM_LEVELS, below).  Each bucket holds the
+min, max and mean price of the five minute intervals in it, so price spikes survive downsampling (the horizon charts draw
+the max by default).  Each cycle wits_ftp_opsys.py folds only the intervals since zoom.pickle was saved (with each
+journal snapshot, see wits_journal.py) into the last buckets of each level.
+
+Each level is written in binary columnar files (see wits_columnar.py) of CHUNK buckets each, numbered by the time they
+start, i.e., all_zoom_30min_5308.bin holds the 30 minute buckets from 5308*144*30 minutes after 1970 (NZ local time).
+Only the files holding buckets changed since zoom.pickle was saved are written each cycle (up to a day of five minute
+buckets, 2-4MB for 240 GXPs, rather than the ~25MB of every level), and files past the days kept are removed.  A small
+index per group (all_zoom.json) has the names and the first and last file number of each level.
+
+The browser (context.wits() in wits_cubism.js) or python (wits_zoom.query) then picks the finest level that keeps the
+whole window with buckets no wider than a pixel (see level, below), and reads only the buckets in the requested range: a
+year wide chart reads ~1500 six hour buckets per GXP (11 files) rather than 105,000 five minute prices.
+
+To (re)build the zoom levels from the replay history (wits_replay.py) and the week journal (wits_journal.py):
+
+python wits_zoom.py --wits_path=/home/dave/python/wits_ftp/
+
+'''
+import os
+import re
+import glob
+import json
+try:
+    import cPickle as pickle   #zoom.pickle is read every cycle
+except ImportError:
+    import pickle
+import datetime as dt
+import numpy as np
+from pandas import *
+import logging
+import argparse
+from wits_columnar import write_columns, dto_seconds
+from wits_journal import wits_journal, write_pickle
+
+#############################################################################################################################################################################
+#Setup command line option and argument parsing
+#############################################################################################################################################################################
+parser = argparse.ArgumentParser(add_help=False)
+parser.add_argument('--wits_path', action="store",dest='wits_path',default='/home/dave/python/wits_ftp/')
+if __name__ == '__main__':
+    cmd_line = parser.parse_args()
+
+#############################################################################################################################################################################
+#Setup logging
+#############################################################################################################################################################################
+
+if __name__ == '__main__':
+    formatter = logging.Formatter('|%(asctime)-6s|%(message)s|','%Y-%m-%d %H:%M')
+    consoleLogger = logging.StreamHandler()
+    consoleLogger.setLevel(logging.INFO)
+    consoleLogger.setFormatter(formatter)
+    logging.getLogger('').addHandler(consoleLogger)
+logger = logging.getLogger('WITS ZOOM')
+logger.setLevel(logging.INFO)
+
+ZOOM_LEVELS = [('5min',5,7),('30min',30,35),('2h',120,140),('6h',360,400),('1d',1440,1830)]  #(label, bucket minutes, days kept), ~1500-2000 buckets each
+GROUPS = ['all','island','region']   #all GXPs, island and region means, as l5w, i5w and r5w
+CHUNK = 144    #buckets per file (12 hours of five minute buckets, 144 days of daily ones)
+
+def level(days,pixel):     #the finest zoom level keeping days with buckets no wider than pixel minutes, else the finest keeping days, else the longest kept
+    kept = [l for l in ZOOM_LEVELS if l[2] >= days]
+    fine = [l for l in kept if l[1] <= pixel]
+    return (fine or kept or ZOOM_LEVELS[-1:])[0]
+
+class wits_zoom():
+
+    def __init__(self,wits_path):
+        self.wits_path = wits_path
+        self.zoom_file = wits_path + 'zoom.pickle'
+        self.last = None    #latest interval folded in, so an interval is never counted twice
+        self.levels = {}    #(group,label) -> {'min','max','sum','count'} frames, bucket start x name
+        self.changed = {}   #(group,label) -> first bucket folded into since load, only the files from there on are written
+        self.rebuilt = False  #zoom.pickle could not be read and the levels were rebuilt, so save them
+
+    #############################################################################################################################################################################
+    def load(self):
+    #############################################################################################################################################################################
+        if os.path.isfile(self.zoom_file):
+            try:
+                state = pickle.load(open(self.zoom_file,'rb'))
+                self.last, self.levels = state['last'], state['levels']
+            except Exception, e:   #i.e., cut short by a power cut, start again from what is left (the replay history and journal)
+                logger.error('Unable to read %s (%s), zoom levels rebuilt' % (self.zoom_file,e))
+                self.rebuild()
+
+    #############################################################################################################################################################################
+    def save(self):
+    #############################################################################################################################################################################
+        write_pickle(self.zoom_file,{'last':self.last,'levels':self.levels})
+
+    #############################################################################################################################################################################
+    def update(self,frames):     #fold any new intervals of {group: names x (dto,TP) frame} into every zoom level
+    #############################################################################################################################################################################
+        last = self.last
+        for group,frame in frames.items():
+            if frame is None or len(frame.columns) == 0:
+                continue
+            dtos = DatetimeIndex(frame.columns.get_level_values(0))
+            new = np.ones(len(dtos),dtype=bool) if self.last is None else np.asarray(dtos > self.last)
+            if not new.any():
+                continue
+            data = DataFrame(frame.values[:,new].T.astype(float), index=dtos[new], columns=frame.index)  #interval x name
+            for label,minutes,days in ZOOM_LEVELS:
+                self.fold(group,label,minutes,days,data)
+            if last is None or dtos[new].max() > last:
+                last = dtos[new].max()
+        self.last = last
+
+    #############################################################################################################################################################################
+    def fold(self,group,label,minutes,days,data):     #min/max/sum/count of data by bucket, merged into the existing buckets of one level
+    #############################################################################################################################################################################
+        step = minutes*60*10**9
+        g = data.groupby(DatetimeIndex((data.index.asi8 // step) * step))
+        new = {'min':g.min(),'max':g.max(),'sum':g.sum(),'count':g.count()}
+        first = new['max'].index[0]
+        if (group,label) not in self.changed or first < self.changed[(group,label)]:
+            self.changed[(group,label)] = first
+        old = self.levels.get((group,label))
+        if old is not None:   #only the buckets from the first new one onwards can change (usually just the last bucket)
+            for k in new:
+                tail = old[k][old[k].index >= first]
+                if len(tail):
+                    grouped = concat([tail,new[k]]).groupby(level=0)
+                    new[k] = grouped.sum() if k in ('sum','count') else getattr(grouped,k)()
+                new[k] = concat([old[k][old[k].index < first],new[k]])
+        cutoff = new['max'].index[-1] - dt.timedelta(days=days)
+        self.levels[(group,label)] = dict((k,v[v.index > cutoff]) for k,v in new.items())
+
+    #############################################################################################################################################################################
+    def series(self,group,label,name,how):     #one min, max or mean bucket series
+    #############################################################################################################################################################################
+        level = self.levels[(group,label)]
+        if how == 'mean':
+            count = level['count'][name]
+            return level['sum'][name] / count[count > 0]
+        return level[how][name]
+
+    #############################################################################################################################################################################
+    def query(self,group,name,start,stop,width,how='max'):     #at most width points (one per pixel) for name between start and stop
+    #############################################################################################################################################################################
+        pixel = (stop - start).total_seconds()/60.0/width   #minutes per pixel
+        label,minutes,days = level((stop - start).total_seconds()/86400.0,pixel)
+        series = self.series(group,label,name,how)
+        series = series[(series.index >= start) & (series.index < stop)]
+        if minutes < pixel:    #still more buckets than pixels, combine them per pixel
+            px = ((series.index.asi8 - Timestamp(start).value) // int(pixel*60*10**9))
+            series = getattr(series.groupby(Timestamp(start) + to_timedelta(px*pixel*60, unit='s')),how)()
+        return series
+
+    #############################################################################################################################################################################
+    def chunk_file(self,group,label,chunk):
+    #############################################################################################################################################################################
+        return self.wits_path + '%s_zoom_%s_%i.bin' % (group,label,chunk)
+
+    #############################################################################################################################################################################
+    def spit_to_bin(self):     #the changed CHUNK bucket files of each group and zoom level, i.e., all_zoom_30min_5308.bin, and the all_zoom.json index
+    #############################################################################################################################################################################
+        for group in GROUPS:
+            index = {'group':group,'names':[],'chunk':CHUNK,'chunks':{}}
+            for label,minutes,days in ZOOM_LEVELS:
+                if (group,label) not in self.levels:
+                    continue
+                level = self.levels[(group,label)]
+                names = list(level['max'].columns)
+                dto = dto_seconds(level['max'].index)
+                chunks = dto // (minutes*60*CHUNK)
+                index['names'] = index['names'] + [str(x) for x in names if str(x) not in index['names']]
+                index['chunks'][label] = [int(chunks[0]),int(chunks[-1])]
+                for old in glob.glob(self.wits_path + '%s_zoom_%s_*.bin' % (group,label)):   #past the days kept
+                    m = re.search(r'_(\d+)\.bin$',old)
+                    if m and int(m.group(1)) < chunks[0]:
+                        os.remove(old)
+                if (group,label) not in self.changed:
+                    continue
+                count = level['count'].reindex(columns=names).values   #as arrays, a frame compare goes column by column
+                total = level['sum'].reindex(columns=names).values
+                mean = np.where(count > 0,total / np.maximum(count,1),np.nan)
+                values = [('min',level['min'].reindex(columns=names).values),('max',level['max'].reindex(columns=names).values),('mean',mean)]
+                for chunk in np.unique(chunks[chunks >= dto_seconds([self.changed[(group,label)]])[0] // (minutes*60*CHUNK)]):
+                    rows = chunks == chunk
+                    columns = [('dto',dto[rows])]
+                    for k,v in values:
+                        columns.append((k,np.ascontiguousarray(v[rows].T,dtype='<f4')))
+                    write_columns(self.chunk_file(group,label,chunk),[str(x) for x in names],columns,step=minutes*60)
+            if index['chunks']:
+                f = open(self.wits_path + '%s_zoom.json.tmp' % group,'w')
+                json.dump(index,f)
+                f.close()
+                os.rename(self.wits_path + '%s_zoom.json.tmp' % group,self.wits_path + '%s_zoom.json' % group)
+
+    #############################################################################################################################################################################
+    def rebuild(self):     #start again from the replay history (if any) and the week (from the journal, see wits_journal.py)
+    #############################################################################################################################################################################
+        self.last = None
+        self.levels = {}
+        self.changed = {}
+        self.rebuilt = True
+        if os.path.isfile(self.wits_path + 'replay.pickle'):
+            history = pickle.load(open(self.wits_path + 'replay.pickle','rb'))
+            self.update({'all':history['l5w'],'island':history['i5w'],'region':history['r5w']})
+        journal = wits_journal(self.wits_path)
+        journal.load()
+        self.update({'all':journal.frames['l5w'],'island':journal.frames['i5w'],'region':journal.frames['r5w']})
+
+#############################################################################################################################################################################
+#Start the programme
+#############################################################################################################################################################################
+
+if __name__ == '__main__':
+    zoom = wits_zoom(cmd_line.wits_path)
+    zoom.rebuild()
+    zoom.save()
+    zoom.spit_to_bin()
+    logger.info('Zoom levels rebuilt up to %s' % zoom.last)